@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.profiling import profile_store
+from typing import List, Dict, Optional
+import secrets
+
+router = APIRouter()
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Only allow access with the configured admin token while profiling is enabled."""
+    if not settings.PROFILING_ENABLED or not settings.PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/profiles", response_model=List[Dict], dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """List the most recent request profiles, newest first."""
+    return [profile.summary() for profile in profile_store.list()]
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: int):
+    """
+    Download a request profile as collapsed stacks.
+    The file can be opened in speedscope or rendered with flamegraph.pl.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        profile.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
+
+@router.delete("/profiles", dependencies=[Depends(require_admin)])
+async def clear_profiles():
+    """Drop all stored profiles."""
+    profile_store.clear()
+    return {"success": True}
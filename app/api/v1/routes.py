@@ -1,14 +1,40 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from app.services.ai_service import AIService
+from app.services.history_service import HISTORY_COLLECTIONS
 from app.services.user_service import UserService
-from app.schemas.conversation import ConversationRequest, ConversationResponse, MessageSchema
-from typing import List, Dict
+from app.services.batch_service import BatchService
+from app.schemas.conversation import ConversationRequest, ConversationResponse, MessageSchema, BatchConversationRequest
+from typing import List, Dict, Optional
 from app.db.mongodb import MongoDB
+from app.core.responses import FastJSONResponse
+from app.core.config import settings
+from app.core.throttling import rate_limiter
+from fastapi.responses import StreamingResponse
 import google.generativeai as genai
 from datetime import datetime
+import math
 
 router = APIRouter()
 
+def _conversation_response(
+    response: Optional[str] = None,
+    messages: Optional[List[Dict]] = None,
+    conversation_id: Optional[str] = None,
+    success: Optional[bool] = None,
+    error: Optional[str] = None
+) -> FastJSONResponse:
+    """
+    Build a response with the ConversationResponse shape without validating it again.
+    The history dicts are produced by AIService, so they are encoded directly.
+    """
+    return FastJSONResponse({
+        "response": response,
+        "messages": messages,
+        "conversation_id": conversation_id,
+        "success": success,
+        "error": error
+    })
+
 @router.post("/conversation/{user_id}", response_model=ConversationResponse)
 async def process_conversation(
     request: Request,
@@ -24,7 +50,19 @@ async def process_conversation(
     
     The conversation history is maintained persistently in MongoDB
     until explicitly cleared by the user.
+    
+    Requests are rate limited per user; over the limit the endpoint returns
+    429 with a Retry-After header.
     """
+    # Reject users over their rate limit before doing any work for them
+    retry_after = await rate_limiter.check(user_id, "http")
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests. Please wait before sending another message.",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    
     # Initialize AI service
     ai_service = AIService()
     
@@ -41,7 +79,7 @@ async def process_conversation(
     if operation == "clear":
         try:
             await ai_service.reset_chat(user_id)
-            return ConversationResponse(
+            return _conversation_response(
                 success=True,
                 messages=[],
                 response="Conversation history cleared"
@@ -54,7 +92,7 @@ async def process_conversation(
     if operation == "history":
         try:
             messages = await ai_service.get_conversation_history(user_id)
-            return ConversationResponse(
+            return _conversation_response(
                 messages=messages,
                 success=True
             )
@@ -101,7 +139,7 @@ async def process_conversation(
                 }
             ]
         
-        return ConversationResponse(
+        return _conversation_response(
             response=response,
             messages=messages,
             success=True
@@ -109,13 +147,42 @@ async def process_conversation(
     except Exception as e:
         print(f"Error in conversation endpoint: {str(e)}")
         # Return a user-friendly error response
-        return ConversationResponse(
+        return _conversation_response(
             response="I'm having trouble processing your request right now. Our team has been notified of the issue.",
             messages=[{"role": "user", "content": conversation.message, "timestamp": datetime.now()}],
             success=False,
             error=f"Internal server error: {str(e)}"
         )
 
+@router.post("/batch/conversations")
+async def process_conversation_batch(batch: BatchConversationRequest):
+    """
+    Process many (user_id, message) pairs in one call, e.g. for monthly insight jobs.
+    
+    Results are streamed back as NDJSON (one JSON event per line):
+    - `job`: the job ID and how many items a previous run already completed
+    - `result`: the response for one item, identified by its index
+    - `progress`: saved after every chunk of items
+    - `done`: final counts
+    
+    Send the same items again with the returned `job_id` to resume an interrupted job;
+    a `job_id` sent with different items is rejected with 409.
+    """
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    if len(batch.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {settings.BATCH_MAX_ITEMS} items")
+    
+    job = await BatchService.load_job(batch.items, batch.job_id)
+    if job is None:
+        raise HTTPException(status_code=409, detail="This job_id was started with different items")
+    job_id, completed = job
+    
+    return StreamingResponse(
+        BatchService.stream_ndjson(batch.items, job_id, completed, concurrency=batch.concurrency),
+        media_type="application/x-ndjson"
+    )
+
 @router.get("/users/sample", response_model=List[str])
 async def get_sample_users(limit: int = 5):
     """Get a list of sample user IDs for testing."""
@@ -152,7 +219,7 @@ async def health_check():
             user_id_found = False
             
             for collection_name in collections:
-                if collection_name == "conversation_history":
+                if collection_name in HISTORY_COLLECTIONS:
                     continue
                     
                 collection = db[collection_name]
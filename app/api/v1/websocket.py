@@ -0,0 +1,179 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app.services.ai_service import AIService
+from app.core.config import settings
+from app.core.metrics import registry as metrics_registry
+from app.core.throttling import rate_limiter
+from app.core.serialization import dumps
+from typing import Dict, Optional
+from datetime import datetime
+import asyncio
+import json
+import time
+
+router = APIRouter()
+
+# Open connections in this worker, in total and per user
+_connections_by_user: Dict[str, int] = {}
+_connection_count = 0
+
+# WebSocket close codes
+CLOSE_NORMAL = 1000
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_MESSAGE_TOO_BIG = 1009
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def _acquire_slot(user_id: str) -> bool:
+    """Reserve a connection slot for the user if the worker and per-user limits allow it."""
+    global _connection_count
+    if _connection_count >= settings.WS_MAX_CONNECTIONS:
+        return False
+    if _connections_by_user.get(user_id, 0) >= settings.WS_MAX_CONNECTIONS_PER_USER:
+        return False
+    _connection_count += 1
+    _connections_by_user[user_id] = _connections_by_user.get(user_id, 0) + 1
+    return True
+
+
+def _release_slot(user_id: str) -> None:
+    global _connection_count
+    _connection_count -= 1
+    remaining = _connections_by_user.get(user_id, 1) - 1
+    if remaining > 0:
+        _connections_by_user[user_id] = remaining
+    else:
+        _connections_by_user.pop(user_id, None)
+
+
+class ConversationSession:
+    """
+    State kept warm for one WebSocket connection.
+    The serialized user context is loaded on the first message and reused until it
+    is older than WS_CONTEXT_TTL, so idle connections hold no user data.
+    """
+
+    __slots__ = ("websocket", "user_id", "ai_service", "context", "context_loaded_at")
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.ai_service = AIService()
+        self.context: Optional[str] = None
+        self.context_loaded_at = 0.0
+
+    async def send(self, payload: Dict) -> None:
+        """Send one event, giving up on clients that stop reading (backpressure)."""
+        await asyncio.wait_for(self.websocket.send_text(dumps(payload)), timeout=settings.WS_SEND_TIMEOUT)
+
+    async def get_context(self) -> str:
+        if self.context is None or time.monotonic() - self.context_loaded_at > settings.WS_CONTEXT_TTL:
+            self.context = await self.ai_service.get_user_context(self.user_id)
+            self.context_loaded_at = time.monotonic()
+        return self.context
+
+    async def handle_message(self, message: str) -> None:
+        user_message = {"role": "user", "content": message, "timestamp": datetime.now()}
+        context = await self.get_context()
+        chunks = []
+        # Tokens are sent one at a time; a slow client only delays its own stream, not the model slot
+        async for text in self.ai_service.stream_conversation(message, self.user_id, context=context):
+            chunks.append(text)
+            await self.send({"type": "token", "text": text})
+        response = "".join(chunks).strip()
+        await self.send({"type": "done", "response": response})
+        await self.send({
+            "type": "history_delta",
+            "messages": [user_message, {"role": "assistant", "content": response, "timestamp": datetime.now()}]
+        })
+
+    async def handle(self, payload: Dict) -> None:
+        operation = payload.get("operation") or payload.get("type") or "message"
+
+        if operation == "ping":
+            await self.send({"type": "pong"})
+            return
+
+        retry_after = await rate_limiter.check(self.user_id, "websocket")
+        if retry_after:
+            await self.send({"type": "error", "error": "Rate limit exceeded", "retry_after": round(retry_after, 1)})
+        elif operation == "history":
+            messages = await self.ai_service.get_conversation_history(self.user_id)
+            await self.send({"type": "history", "messages": messages})
+        elif operation == "clear":
+            await self.ai_service.reset_chat(self.user_id)
+            await self.send({"type": "cleared", "messages": []})
+        elif operation == "refresh":
+            self.context = None
+            await self.get_context()
+            await self.send({"type": "refreshed"})
+        elif operation == "message":
+            message = payload.get("message")
+            if not isinstance(message, str) or not message.strip():
+                await self.send({"type": "error", "error": "Message is required"})
+            elif len(message) > settings.WS_MAX_MESSAGE_CHARS:
+                await self.send({"type": "error", "error": f"Message exceeds {settings.WS_MAX_MESSAGE_CHARS} characters"})
+            else:
+                await self.handle_message(message)
+        else:
+            await self.send({"type": "error", "error": f"Unknown operation: {operation}"})
+
+
+@router.websocket("/conversation/{user_id}/ws")
+async def conversation_socket(websocket: WebSocket, user_id: str):
+    """
+    Conversation channel that keeps one session per connection.
+
+    Client events are JSON objects with an `operation` of `message` (with a
+    `message` field), `history`, `clear`, `refresh` (reload the user context)
+    or `ping`. Responses to a message are streamed as `token` events followed by
+    a `done` event and a `history_delta` with the two new messages.
+    Turns are handled one at a time per connection. Events other than `ping`
+    count against the user's rate limit; over it they get an `error` event
+    with `retry_after` seconds.
+    """
+    if not _acquire_slot(user_id):
+        metrics_registry.events.inc("ws_connection_rejected")
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        return
+
+    metrics_registry.events.inc("ws_connection_opened")
+    session = ConversationSession(websocket, user_id)
+    try:
+        await websocket.accept()
+        await session.send({"type": "ready", "user_id": user_id})
+        while True:
+            try:
+                raw = await asyncio.wait_for(websocket.receive_text(), timeout=settings.WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await websocket.close(code=CLOSE_NORMAL, reason="Idle timeout")
+                break
+            if len(raw) > settings.WS_MAX_MESSAGE_CHARS * 4:
+                await websocket.close(code=CLOSE_MESSAGE_TOO_BIG)
+                break
+            try:
+                payload = json.loads(raw)
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                await session.send({"type": "error", "error": "Events must be JSON objects"})
+                continue
+            metrics_registry.events.inc("ws_event")
+            await session.handle(payload)
+    except WebSocketDisconnect:
+        pass
+    except asyncio.TimeoutError:
+        # The client stopped reading; drop it rather than buffering without bound
+        metrics_registry.events.inc("ws_slow_consumer_closed")
+        try:
+            await websocket.close(code=CLOSE_POLICY_VIOLATION, reason="Client too slow")
+        except Exception:
+            pass
+    except Exception as e:
+        print(f"Error in conversation socket for user {user_id}: {str(e)}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        _release_slot(user_id)
+        metrics_registry.events.inc("ws_connection_closed")
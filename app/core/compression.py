@@ -0,0 +1,100 @@
+"""
+Response compression with brotli (when installed) or gzip.
+
+Only complete, single-message responses are compressed: the body is already in
+memory, so it is compressed in one call. Streaming responses (NDJSON, SSE) and
+bodies smaller than the minimum size are passed through untouched.
+"""
+import gzip
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/x-ndjson")
+
+
+def _accepted_encodings(scope) -> Iterable[str]:
+    for key, value in scope.get("headers", []):
+        if key == b"accept-encoding":
+            for item in value.decode("latin-1").split(","):
+                coding, _, params = item.strip().partition(";")
+                if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+                    continue
+                yield coding.strip().lower()
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses large JSON and text responses."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose(self, scope) -> Optional[str]:
+        accepted = set(_accepted_encodings(scope))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._choose(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Hold the headers until the body tells us whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = list(start_message.get("headers", []))
+            content_type = next((v for k, v in headers if k == b"content-type"), b"")
+            already_encoded = any(k == b"content-encoding" for k, _ in headers)
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or already_encoded
+                or len(body) < self.minimum_size
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = self._compress(encoding, body)
+            vary = [v for k, v in headers if k == b"vary"]
+            headers = [(k, v) for k, v in headers if k not in (b"content-length", b"vary")]
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+            headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+            headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,6 +1,12 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict
 from functools import lru_cache
+import os
+import tempfile
+
+# Project root, so the .env file is found regardless of the working directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 class Settings(BaseSettings):
     # API Settings
@@ -12,12 +18,76 @@ class Settings(BaseSettings):
     # MongoDB Settings
     MONGODB_URI: str
     MONGODB_DB_NAME: str = "sample_mflix"
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_POOL_SIZE: int = 100
     
     # Google AI Settings
     GOOGLE_API_KEY: str
     
+    # Response Settings
+    RESPONSE_COMPRESSION_ENABLED: bool = True
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024  # Bytes; smaller bodies are sent as is
+    
+    # WebSocket Settings
+    WS_MAX_CONNECTIONS: int = 10000  # Per worker
+    WS_MAX_CONNECTIONS_PER_USER: int = 5
+    WS_MAX_MESSAGE_CHARS: int = 4000
+    WS_IDLE_TIMEOUT: float = 600.0  # Seconds without a client event before closing
+    WS_SEND_TIMEOUT: float = 10.0  # Seconds a client may stall reading before it is dropped
+    WS_CONTEXT_TTL: float = 300.0  # Seconds a session reuses the serialized user context
+    WS_STREAM_BUFFER_CHUNKS: int = 64  # Response chunks buffered for a slow client; later ones are merged
+    
+    # Batch Settings
+    BATCH_MAX_ITEMS: int = 10000
+    BATCH_CONCURRENCY: int = 8  # Default concurrent model calls per batch
+    BATCH_MAX_CONCURRENCY: int = 32
+    BATCH_CHUNK_SIZE: int = 100  # Items whose contexts are fetched together
+    
+    # Conversation History Settings
+    HISTORY_RETENTION_DAYS: Optional[float] = None  # Delete messages (both tiers) after this many days
+    HISTORY_ARCHIVE_AFTER_DAYS: Optional[float] = None  # Move older messages into compressed archive buckets
+    HISTORY_ARCHIVE_BUCKET_SIZE: int = 200  # Messages per archive bucket
+    HISTORY_ARCHIVE_INTERVAL: float = 3600.0  # Seconds between archive runs; 0 disables them in this worker
+    HISTORY_CREATE_INDEXES: bool = True
+
+    # Rate Limiting and Scheduling Settings
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: float = 60.0  # Sustained conversation requests/messages per user
+    RATE_LIMIT_BURST: int = 20  # Requests a user may send at once after being idle
+    RATE_LIMIT_STORE: str = "memory"  # "memory" (per worker) or "sqlite" (shared by the workers on a host)
+    RATE_LIMIT_STORE_PATH: str = os.path.join(tempfile.gettempdir(), "smartfin_rate_limits.sqlite3")
+    MODEL_CONCURRENCY: int = 16  # Concurrent model calls per worker
+    MODEL_USER_WEIGHTS: Dict[str, float] = {}  # Fair scheduling weight (> 0) per user_id (default 1), as JSON
+
+    # Startup Warm-up Settings
+    WARMUP_ENABLED: bool = True
+    WARMUP_TIMEOUT: float = 10.0  # Seconds startup waits for warm-up before serving anyway
+    WARMUP_MODEL_CONNECTION: bool = True  # Open the Gemini API connection with a token count request
+    WARMUP_MONGO_CONNECTIONS: int = 4  # Pool connections opened before the first request
+    WARMUP_RECENT_USERS: int = 0  # Recently active users whose data is read into MongoDB's cache
+
+    # Observability Settings
+    METRICS_ENABLED: bool = True
+    
+    # Profiling Settings
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of requests profiled automatically
+    PROFILING_INTERVAL_MS: float = 2.0
+    PROFILING_BUFFER_SIZE: int = 20
+    PROFILING_ADMIN_TOKEN: Optional[str] = None  # Required by the X-Profile header and admin endpoints
+    
+    @field_validator("MODEL_USER_WEIGHTS")
+    @classmethod
+    def _check_user_weights(cls, weights: Dict[str, float]) -> Dict[str, float]:
+        # The fair scheduler divides by the weight; zero or negative weights would break its order
+        for user_id, weight in weights.items():
+            if not weight > 0:
+                raise ValueError(f"MODEL_USER_WEIGHTS[{user_id!r}] must be greater than 0, got {weight}")
+        return weights
+    
     class Config:
-        env_file = ".env"
+        # A .env in the working directory overrides the one in the project root
+        env_file = (os.path.join(BASE_DIR, ".env"), ".env")
         case_sensitive = True
 
 @lru_cache()
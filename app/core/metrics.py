@@ -0,0 +1,271 @@
+"""
+Lightweight per-request instrumentation.
+
+Code on the hot path records stage timings and counters through `stage()` and
+`incr()`. The values are collected per request by `MetricsMiddleware`, reported
+in a `Server-Timing` response header, and aggregated into Prometheus metrics
+served by the `/metrics` endpoint.
+
+When metrics are disabled the middleware is not installed, no request context
+is ever set, and `stage()`/`incr()` reduce to a single ContextVar lookup.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestMetrics:
+    """Stage timings and counters gathered while serving a single request."""
+
+    __slots__ = ("start", "stages", "counters")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("smartfin_request_metrics", default=None)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics: RequestMetrics, name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        stages = self._metrics.stages
+        stages[self._name] = stages.get(self._name, 0.0) + duration
+        return False
+
+
+def stage(name: str):
+    """Time a block of code as a named stage of the current request."""
+    current = _current.get()
+    if current is None:
+        return _NULL_STAGE
+    return _Stage(current, name)
+
+
+def incr(name: str, amount: float = 1) -> None:
+    """Add to a named counter of the current request."""
+    current = _current.get()
+    if current is not None:
+        current.counters[name] = current.counters.get(name, 0) + amount
+
+
+def current_request() -> Optional[RequestMetrics]:
+    """Return the metrics of the request being served, if instrumentation is active."""
+    return _current.get()
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...], labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    bucket_labels = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide aggregation of request metrics in Prometheus form."""
+
+    def __init__(self):
+        self.requests = Counter(
+            "smartfin_requests_total", "HTTP requests served.", ("method", "route", "status")
+        )
+        self.request_duration = Histogram(
+            "smartfin_request_duration_seconds", "HTTP request latency.", LATENCY_BUCKETS, ("method", "route")
+        )
+        self.stage_duration = Histogram(
+            "smartfin_stage_duration_seconds", "Time spent in each stage of a request.", LATENCY_BUCKETS, ("route", "stage")
+        )
+        self.mongo_round_trips = Histogram(
+            "smartfin_mongo_round_trips", "MongoDB round-trips per request.", COUNT_BUCKETS, ("route",)
+        )
+        self.prompt_bytes = Histogram(
+            "smartfin_prompt_bytes", "Size of prompts sent to the model.", BYTES_BUCKETS
+        )
+        self.events = Counter(
+            "smartfin_events_total", "Counted events such as cache hits and misses.", ("event",)
+        )
+        self.throttled = Counter(
+            "smartfin_throttled_total", "Requests rejected by the per-user rate limiter.", ("channel",)
+        )
+
+    def record_request(self, method: str, route: str, status: int, metrics: RequestMetrics, duration: float) -> None:
+        self.requests.inc(method, route, str(status))
+        self.request_duration.observe(duration, method, route)
+        for name, seconds in metrics.stages.items():
+            self.stage_duration.observe(seconds, route, name)
+        counters = metrics.counters
+        self.mongo_round_trips.observe(counters.get("mongo_round_trips", 0), route)
+        for name, value in counters.items():
+            if name == "mongo_round_trips":
+                continue
+            if name == "prompt_bytes":
+                self.prompt_bytes.observe(value)
+            else:
+                self.events.inc(name, amount=value)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (
+            self.requests, self.request_duration, self.stage_duration,
+            self.mongo_round_trips, self.prompt_bytes, self.events, self.throttled,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts MongoDB commands against the request that issued them.
+
+    Motor runs PyMongo calls on a thread pool but copies the caller's context,
+    so the request ContextVar is visible here.
+    """
+
+    def started(self, event) -> None:
+        incr("mongo_round_trips")
+
+    def succeeded(self, event) -> None:
+        pass
+
+    def failed(self, event) -> None:
+        pass
+
+
+def _server_timing(metrics: RequestMetrics, total: float) -> bytes:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in metrics.stages.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+def _route_label(scope) -> str:
+    """Return the templated route path (e.g. /api/v1/conversation/{user_id}) to keep label cardinality bounded."""
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware that opens a metrics context for every HTTP request."""
+
+    def __init__(self, app, registry: MetricsRegistry = registry, exclude_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.registry = registry
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(metrics, metrics.elapsed())))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.registry.record_request(scope.get("method", ""), _route_label(scope), status, metrics, metrics.elapsed())
@@ -0,0 +1,178 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+A request is profiled when it carries the profiling header with the admin token,
+or when it is picked by the configured sample rate. While it is being served a
+background thread samples the event loop thread's Python stack at a fixed
+interval. The samples are stored as collapsed stacks ("frame;frame;frame count"),
+which flamegraph.pl and speedscope read directly, in a bounded ring buffer.
+
+Only one request is profiled at a time; other requests that would be sampled
+meanwhile are served normally. All requests on the event loop share the thread,
+so under concurrency a profile also contains work done for other requests.
+"""
+import hmac
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+class RequestProfile:
+    """Collapsed stack samples captured while serving one request."""
+
+    def __init__(self, profile_id: int, method: str, path: str, interval: float):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = datetime.now()
+        self.duration_ms = 0.0
+        self.status: Optional[int] = None
+        self.stacks: Counter = Counter()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+        }
+
+    def collapsed(self) -> str:
+        """Render in the collapsed stack format used by flame graph tools."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _collapse(frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    frames.reverse()
+    return ";".join(frames)
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, target_thread_id: int, profile: RequestProfile):
+        super().__init__(name="smartfin-profiler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.profile = profile
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        interval = self.profile.interval
+        stacks = self.profile.stacks
+        while not self._stop_event.wait(interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is not None:
+                stacks[_collapse(frame)] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileStore:
+    """Keeps the last N request profiles."""
+
+    def __init__(self, size: int):
+        self._profiles = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests selected by header or sample rate."""
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        interval: float = 0.002,
+        header: str = "x-profile",
+        token: Optional[str] = None,
+    ):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.header = header.lower().encode("latin-1")
+        self.token = token.encode("latin-1") if token else None
+        self._busy = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _requested(self, scope) -> bool:
+        if self.token is None:
+            return False
+        for key, value in scope.get("headers", []):
+            if key == self.header:
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        selected = self._requested(scope) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        if not selected or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(next(self._ids), scope.get("method", ""), scope.get("path", ""), self.interval)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", str(profile.id).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler = _StackSampler(threading.get_ident(), profile)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            profile.duration_ms = (time.perf_counter() - start) * 1000.0
+            self.store.add(profile)
+            self._busy.release()
+
+
+profile_store = ProfileStore(settings.PROFILING_BUFFER_SIZE)
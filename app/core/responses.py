@@ -0,0 +1,19 @@
+"""
+Response classes built on the BSON-aware serializer.
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.core.serialization import dumpb
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with the single-pass encoder.
+    Returning it from an endpoint also bypasses response_model re-validation,
+    so it is meant for payloads the service built itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumpb(content)
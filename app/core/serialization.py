@@ -0,0 +1,113 @@
+"""
+Single-pass JSON serialization of MongoDB documents for prompt context.
+
+BSON values (ObjectId, datetime, Decimal128, ...) are converted by the encoder's
+default hook while it writes, so documents are neither pre-walked nor mutated.
+orjson is used when it is installed, with the standard library encoder as the
+fallback. Output is compact (no whitespace between tokens).
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _bson_default(value: Any) -> Any:
+    """Convert values the JSON encoders do not handle natively."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+_std_encoder = json.JSONEncoder(default=_bson_default, separators=(",", ":"), ensure_ascii=False)
+
+
+def dumps(value: Any) -> str:
+    """Encode a value (including BSON types) as compact JSON."""
+    return dumpb(value).decode("utf-8")
+
+
+def dumpb(value: Any) -> bytes:
+    """Encode a value (including BSON types) as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_bson_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers beyond 64 bits; the standard encoder handles them
+            pass
+    return _std_encoder.encode(value).encode("utf-8")
+
+
+def _remaining_budget(value: Any, budget: int) -> int:
+    """
+    Estimate the JSON size of a value and return the budget left over.
+    Stops walking as soon as the budget is used up, so large values cost at most
+    `budget` worth of work instead of being fully rendered to be measured.
+    """
+    if isinstance(value, dict):
+        budget -= 2
+        for key, item in value.items():
+            budget = _remaining_budget(item, budget - len(key) - 4)
+            if budget < 0:
+                return budget
+        return budget
+    if isinstance(value, (list, tuple)):
+        budget -= 2
+        for item in value:
+            budget = _remaining_budget(item, budget - 1)
+            if budget < 0:
+                return budget
+        return budget
+    if isinstance(value, str):
+        return budget - len(value) - 2
+    if isinstance(value, ObjectId):
+        return budget - 26
+    if isinstance(value, datetime):
+        return budget - 28
+    return budget - len(str(value))
+
+
+def _cap_document(doc: Dict, field_cap: int) -> Dict:
+    """Shallow copy of a document without dict/list fields estimated at field_cap bytes or more."""
+    return {
+        k: v for k, v in doc.items()
+        if not isinstance(v, (dict, list)) or _remaining_budget(v, field_cap - 1) >= 0
+    }
+
+
+def serialize_user_context(user_data: Dict[str, Any], field_cap: Optional[int] = 1000) -> str:
+    """
+    Serialize the per-collection user data gathered for a prompt.
+
+    `user_data` maps a collection name to either a single document or a list of
+    documents. When a collection returned several documents, nested dict/list
+    fields of about `field_cap` bytes or more are dropped from each of them to
+    keep the prompt manageable; single documents are written as is. The input is
+    not modified.
+    """
+    if field_cap:
+        user_data = {
+            name: [_cap_document(doc, field_cap) if isinstance(doc, dict) else doc for doc in value]
+            if isinstance(value, list) and len(value) > 1 else value
+            for name, value in user_data.items()
+        }
+    return dumps(user_data)
+
@@ -0,0 +1,213 @@
+"""
+Per-user rate limiting and fair scheduling of model calls.
+
+`rate_limiter` enforces a token bucket per user_id: RATE_LIMIT_BURST requests
+at once, refilled at RATE_LIMIT_PER_MINUTE. Buckets live in this worker's
+memory, or in a SQLite file (RATE_LIMIT_STORE=sqlite) so all workers on a host
+share the same limits; the store interface is small enough to back with Redis
+or similar when limits must span hosts.
+
+`model_scheduler` caps concurrent model calls per worker at MODEL_CONCURRENCY
+and, when they are all busy, hands free slots to waiting users in weighted
+fair order (virtual finish times, as in weighted fair queuing), so a user with many queued calls cannot
+starve users with few. Calls run on the scheduler's own thread pool, sized to
+the same limit, so no unfair queue forms behind it.
+"""
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.metrics import registry as metrics_registry
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryBucketStore:
+    """Token buckets in this worker's memory."""
+
+    def __init__(self, max_keys: int = 100000):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._max_keys = max_keys
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 if allowed, else seconds until enough tokens are available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = _refill(tokens, updated, now, rate, burst)
+        if tokens >= cost:
+            self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self._max_keys:
+                self._prune(now, rate, burst)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (cost - tokens) / rate
+
+    def _prune(self, now: float, rate: float, burst: float) -> None:
+        # A bucket that has refilled completely is the same as no bucket
+        self._buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+            if _refill(tokens, updated, now, rate, burst) < burst
+        }
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file, shared by every worker process on the host.
+    Each take is one short write transaction, run off the event loop.
+    """
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+        )
+        self._lock = threading.Lock()
+
+    def _take(self, key: str, rate: float, burst: float, cost: float) -> float:
+        now = time.time()  # Wall clock, since workers do not share a monotonic clock
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                row = cursor.execute(
+                    "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = _refill(row[0], row[1], now, rate, burst) if row else burst
+                wait = 0.0 if tokens >= cost else (cost - tokens) / rate
+                if not wait:
+                    tokens -= cost
+                cursor.execute(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                    (key, tokens, now)
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        return await asyncio.to_thread(self._take, key, rate, burst, cost)
+
+
+class RateLimiter:
+    def __init__(self, store):
+        self.store = store
+
+    async def check(self, user_id: str, channel: str, cost: float = 1.0) -> float:
+        """
+        Charge a request to the user's bucket. Returns 0 if it may proceed, otherwise
+        the seconds to wait before retrying; rejections are counted per channel.
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return 0.0
+        try:
+            retry_after = await self.store.take(
+                user_id, settings.RATE_LIMIT_PER_MINUTE / 60.0, float(settings.RATE_LIMIT_BURST), cost
+            )
+        except Exception as e:
+            # Fail open: a broken limiter store must not take the API down
+            print(f"Error checking rate limit for user {user_id}: {e}")
+            return 0.0
+        if retry_after:
+            metrics_registry.throttled.inc(channel)
+        return retry_after
+
+
+class FairScheduler:
+    """
+    Limits concurrent model calls and serves waiting users in weighted fair order.
+
+    Every waiting call gets a virtual finish tag of max(virtual time, the user's
+    previous tag) + 1 / weight, and free slots go to the smallest tag. A user with
+    twice the weight gets twice the share of slots while others are waiting.
+    """
+
+    def __init__(self, concurrency: int, weights: Optional[Dict[str, float]] = None):
+        self.concurrency = max(1, concurrency)
+        self.weights = weights or {}
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="model")
+        self.active = 0
+        self.virtual_time = 0.0
+        self._tags: Dict[str, float] = {}
+        self._queue: list = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, user_id: str) -> None:
+        if self.active < self.concurrency and not self._queue:
+            self.active += 1
+            return
+        tag = max(self.virtual_time, self._tags.get(user_id, 0.0)) + 1.0 / self.weights.get(user_id, 1.0)
+        self._tags[user_id] = tag
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (tag, next(self._sequence), future))
+        metrics.incr("model_queued")
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._queue:
+            tag, _, future = heapq.heappop(self._queue)
+            if future.cancelled():
+                continue
+            # The slot passes straight to the next call, so `active` is unchanged
+            self.virtual_time = tag
+            future.set_result(None)
+            return
+        self.active -= 1
+        if len(self._tags) > 10000:
+            # Tags at or behind the virtual time no longer affect the order
+            self._tags = {user_id: tag for user_id, tag in self._tags.items() if tag > self.virtual_time}
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        """Hold one model call slot for the user, e.g. for a whole streamed response."""
+        with metrics.stage("model_queue"):
+            await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def call(self, func: Callable, *args, **kwargs):
+        """Run a blocking SDK call on the model thread pool; the caller must hold a slot."""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    async def run(self, user_id: str, func: Callable, *args, **kwargs):
+        """Wait for a fair slot, then run a blocking SDK call."""
+        async with self.slot(user_id):
+            return await self.call(func, *args, **kwargs)
+
+
+def _create_store():
+    if settings.RATE_LIMIT_STORE == "sqlite":
+        try:
+            return SQLiteBucketStore(settings.RATE_LIMIT_STORE_PATH)
+        except Exception as e:
+            print(f"Error opening rate limit store {settings.RATE_LIMIT_STORE_PATH}, using memory: {e}")
+    return MemoryBucketStore()
+
+
+rate_limiter = RateLimiter(_create_store())
+model_scheduler = FairScheduler(settings.MODEL_CONCURRENCY, settings.MODEL_USER_WEIGHTS)
@@ -1,6 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from typing import Optional
 from app.core.config import settings
+from app.core.metrics import MongoCommandListener
 
 class MongoDB:
     client: Optional[AsyncIOMotorClient] = None
@@ -15,7 +16,14 @@ class MongoDB:
         mongo_uri = uri or settings.MONGODB_URI
         db_name = settings.MONGODB_DB_NAME
         
-        cls.client = AsyncIOMotorClient(mongo_uri)
+        # Count round-trips per request only when metrics are collected
+        event_listeners = [MongoCommandListener()] if settings.METRICS_ENABLED else []
+        cls.client = AsyncIOMotorClient(
+            mongo_uri,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            event_listeners=event_listeners
+        )
         cls.db = cls.client[db_name]
         
         # Test connection
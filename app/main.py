@@ -1,8 +1,17 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.routes import router as api_router
+from app.api.v1.admin import router as admin_router
+from app.api.v1.websocket import router as ws_router
 from app.db.mongodb import MongoDB
+from app.services.history_service import HistoryService
+from app.services.warmup_service import WarmupService
+import asyncio
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware, registry as metrics_registry
+from app.core.profiling import ProfilingMiddleware, profile_store
 import os
 
 app = FastAPI(
@@ -20,19 +29,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (e.g. long conversation histories) with brotli or gzip
+if settings.RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.RESPONSE_COMPRESSION_MIN_SIZE)
+
+# Collect per-request stage timings and counters
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Sample the stack of selected requests (X-Profile header or sample rate)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        interval=settings.PROFILING_INTERVAL_MS / 1000.0,
+        token=settings.PROFILING_ADMIN_TOKEN,
+    )
+
 # Include routers
 app.include_router(api_router, prefix="/api/v1")
+app.include_router(ws_router, prefix="/api/v1")
+app.include_router(admin_router, prefix="/api/v1/admin", tags=["admin"])
 
 # Initialize MongoDB connection
 @app.on_event("startup")
 async def startup_db_client():
+    mongo_connected = True
     try:
         await MongoDB.connect(os.environ.get("MONGODB_URI"))
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
+        mongo_connected = False
+    if mongo_connected:
+        if settings.HISTORY_CREATE_INDEXES:
+            await HistoryService.ensure_indexes()
+        HistoryService.start_archiver()
+
+    # Pay for model setup and connections here rather than in the first requests;
+    # the model is warmed up even when MongoDB is unavailable
+    if settings.WARMUP_ENABLED:
+        try:
+            await asyncio.wait_for(WarmupService.run(mongo_connected), timeout=settings.WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"Warm-up did not finish within {settings.WARMUP_TIMEOUT}s; serving anyway")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await HistoryService.stop_archiver()
     try:
         await MongoDB.close()
     except Exception as e:
@@ -45,4 +89,11 @@ async def root():
         "message": "SmartFin AI API is running",
         "docs": "/docs",
         "version": settings.PROJECT_VERSION
-    }
\ No newline at end of file
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose request and stage metrics in Prometheus text format."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
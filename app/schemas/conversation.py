@@ -19,4 +19,15 @@ class ConversationResponse(BaseModel):
     messages: Optional[List[MessageSchema]] = Field(None, description="Conversation history")
     conversation_id: Optional[str] = Field(None, description="Conversation ID")
     success: Optional[bool] = Field(None, description="Operation success status")
-    error: Optional[str] = Field(None, description="Error message if operation failed") 
\ No newline at end of file
+    error: Optional[str] = Field(None, description="Error message if operation failed")
+
+class BatchConversationItem(BaseModel):
+    """A single user message in a batch request"""
+    user_id: str = Field(..., description="User ID, resolved the same way as in /conversation/{user_id}")
+    message: str = Field(..., description="User message")
+
+class BatchConversationRequest(BaseModel):
+    """Schema for a batch of conversation messages processed in one call"""
+    items: List[BatchConversationItem] = Field(..., description="Messages to process")
+    job_id: Optional[str] = Field(None, description="ID of a previous job to resume; items already completed are skipped")
+    concurrency: Optional[int] = Field(None, ge=1, description="Maximum concurrent model calls")
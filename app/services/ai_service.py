@@ -1,16 +1,35 @@
 import os
+import asyncio
+import weakref
+from collections import deque
 import google.generativeai as genai
 from app.core.config import settings
 import json
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, AsyncIterator
+from functools import lru_cache
 from datetime import datetime
 from bson import ObjectId
 from app.db.mongodb import MongoDB
+from app.core import metrics, throttling
+from app.core.serialization import serialize_user_context
+from app.services.history_service import HistoryService, HISTORY_COLLECTIONS
 
+# Nested dict/list fields of multi-document results larger than this (in JSON bytes)
+# are left out of the prompt context
+CONTEXT_FIELD_CAP = 1000
+
+EMPTY_RESPONSE_MESSAGE = "I understand your question but I'm having trouble formulating a response. Could you please rephrase your question or ask something more specific about your finances?"
+MODEL_ERROR_MESSAGE = "I apologize, but I'm having trouble processing your request right now. This may be due to a temporary issue with the AI service. Please try again shortly."
+CONTEXT_ERROR_MESSAGE = "I'm having trouble accessing your financial data at the moment. Is there something general I can help you with about financial planning or advice?"
+
+# Resolved from this file so prompts load regardless of the working directory
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'prompt')
+
+@lru_cache()
 def _load_prompt(file_name: str) -> str:
-    """Load prompt from a file with error handling."""
+    """Load prompt from a file with error handling. Each file is read once."""
     try:
-        file_path = os.path.join('app', 'prompt', file_name)
+        file_path = os.path.join(PROMPT_DIR, file_name)
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read().strip()
     except FileNotFoundError:
@@ -21,16 +40,53 @@ def _load_prompt(file_name: str) -> str:
         return "Unable to load prompt due to an error."
 
 
+class _ChunkBuffer:
+    """
+    Response chunks handed from a model stream to a possibly slower consumer.
+    Holds at most `limit` entries; when full, new text is appended to the last entry,
+    so the producer never waits for the consumer.
+    """
+    
+    def __init__(self, limit: int):
+        self._chunks = deque()
+        self._limit = max(1, limit)
+        self._ready = asyncio.Event()
+        self.closed = False
+    
+    def put(self, text: str) -> None:
+        if len(self._chunks) >= self._limit:
+            self._chunks[-1] += text
+        else:
+            self._chunks.append(text)
+        self._ready.set()
+    
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+    
+    async def get(self) -> Optional[str]:
+        """The next chunk, or None once the stream has ended and the buffer is empty."""
+        while not self._chunks:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self._chunks.popleft()
+
+
 class AIService:
     model = None
     chats = {}  # Store chats by user ID
+    _stream_tasks = set()  # Model streams still being read for a consumer
+    # One lock per user while their chat is in use; SDK chat sessions are not safe for concurrent turns
+    _chat_locks = weakref.WeakValueDictionary()
     
     @classmethod
     def initialize(cls):
         """Initialize the Gemini AI model."""
         if cls.model is None:
             try:
-                genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+                genai.configure(api_key=settings.GOOGLE_API_KEY)
                 cls.model = genai.GenerativeModel('gemini-2.0-flash-exp', system_instruction=_load_prompt('system_instruction.txt'))
                 return True
             except Exception as e:
@@ -38,6 +94,30 @@ class AIService:
                 return False
         return True
     
+    @classmethod
+    async def warm_up(cls) -> bool:
+        """
+        Initialize the model before the first request and, with WARMUP_MODEL_CONNECTION,
+        open its API connection with a token count request (no content is generated).
+        """
+        if not cls.initialize():
+            return False
+        if settings.WARMUP_MODEL_CONNECTION:
+            try:
+                await asyncio.to_thread(cls.model.count_tokens, "warm-up")
+            except Exception as e:
+                print(f"Error warming up AI model connection: {e}")
+        return True
+    
+    @classmethod
+    def _chat_lock(cls, user_id: str) -> asyncio.Lock:
+        """The lock serializing model use of a user's chat (replay, send and stream)."""
+        lock = cls._chat_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            cls._chat_locks[user_id] = lock
+        return lock
+    
     async def reset_chat(self, user_id: str) -> None:
         """Reset the chat history for a user and clear it from MongoDB."""
         if user_id in self.chats:
@@ -45,11 +125,9 @@ class AIService:
         
         # Also clear from database
         try:
-            db = MongoDB.get_db()
-            # Delete records with both user_id and userId fields
-            await db.conversation_history.delete_many(
-                {"$or": [{"user_id": user_id}, {"userId": user_id}]}
-            )
+            # Delete recent and archived messages
+            with metrics.stage("history_clear"):
+                await HistoryService.delete_user(user_id)
         except Exception as e:
             print(f"Error clearing conversation history from MongoDB: {e}")
     
@@ -57,61 +135,66 @@ class AIService:
         """
         Get existing chat or create a new one for the user.
         Loads conversation history from MongoDB if available.
+        Runs under the user's chat lock, so concurrent first turns create and replay it once.
         """
-        if user_id not in self.chats:
-            try:
-                # Use class method rather than instance method
-                AIService.initialize()
-                
-                # Ensure we have a reference to the model
-                model = AIService.model
-                if not model:
-                    print(f"Error: AI model is not initialized")
+        async with self._chat_lock(user_id):
+            if user_id not in self.chats:
+                metrics.incr("chat_cache_miss")
+                try:
+                    # Use class method rather than instance method
+                    AIService.initialize()
+                    
+                    # Ensure we have a reference to the model
+                    model = AIService.model
+                    if not model:
+                        print(f"Error: AI model is not initialized")
+                        return None
+                    
+                    # Create a new chat
+                    self.chats[user_id] = model.start_chat(history=[])
+                    
+                    # Try to load previous conversation from MongoDB
+                    with metrics.stage("history_rehydration"):
+                        await self._load_conversation_history(user_id)
+                except Exception as e:
+                    print(f"Error creating chat for user {user_id}: {e}")
                     return None
-                
-                # Create a new chat
-                self.chats[user_id] = model.start_chat(history=[])
-                
-                # Try to load previous conversation from MongoDB
-                await self._load_conversation_history(user_id)
-            except Exception as e:
-                print(f"Error creating chat for user {user_id}: {e}")
-                return None
-        return self.chats[user_id]
+            else:
+                metrics.incr("chat_cache_hit")
+            return self.chats.get(user_id)
     
     async def _load_conversation_history(self, user_id: str) -> None:
         """
         Load conversation history from MongoDB and apply it to the current chat.
         """
         try:
-            db = MongoDB.get_db()
-            # Get the most recent 50 messages - check both user_id and userId fields
-            messages = await db.conversation_history.find(
-                {"$or": [{"user_id": user_id}, {"userId": user_id}]}
-            ).sort("timestamp", -1).limit(50).to_list(50)
-            
-            # Sort messages by timestamp so they're in chronological order
-            messages.sort(key=lambda x: x.get("timestamp", datetime.min))
+            # Get the most recent 50 messages in chronological order, reading
+            # archived messages too if the user has fewer recent ones
+            messages = await HistoryService.recent_messages(user_id, 50)
             
             # If we have messages, add them to the chat
             if messages and user_id in self.chats:
                 chat = self.chats[user_id]
+                scheduler = throttling.model_scheduler
                 
-                # Add each message to the chat
-                for msg in messages:
-                    role = msg.get("role")
-                    content = msg.get("content")
-                    
-                    if role and content:
-                        # We don't await this because Gemini's API doesn't need async
-                        # We're just replaying the history, not generating new responses
-                        if role == "user":
-                            chat.send_message(content)
-                        else:
-                            # For assistant messages, we add them directly to history
-                            # but this depends on the Gemini API implementation
-                            # This might need adjustment based on how the API works
-                            pass
+                # Replaying calls the model too, so it takes a fair-scheduled slot
+                async with scheduler.slot(user_id):
+                    # Add each message to the chat
+                    for msg in messages:
+                        role = msg.get("role")
+                        content = msg.get("content")
+                        
+                        if role and content:
+                            # We're just replaying the history, not generating new responses;
+                            # the SDK call is blocking, so keep it off the event loop
+                            if role == "user":
+                                metrics.incr("history_replay_messages")
+                                await scheduler.call(chat.send_message, content)
+                            else:
+                                # For assistant messages, we add them directly to history
+                                # but this depends on the Gemini API implementation
+                                # This might need adjustment based on how the API works
+                                pass
         except Exception as e:
             print(f"Error loading conversation history for user {user_id}: {e}")
     
@@ -121,42 +204,89 @@ class AIService:
         """
         try:
             db = MongoDB.get_db()
-            await db.conversation_history.insert_one({
-                "user_id": user_id,  # Keep this for backward compatibility
-                "userId": user_id,   # Add this to match database structure
-                "role": role,
-                "content": content,
-                "timestamp": datetime.now()
-            })
+            with metrics.stage("save_message"):
+                await db.conversation_history.insert_one({
+                    "user_id": user_id,  # Keep this for backward compatibility
+                    "userId": user_id,   # Add this to match database structure
+                    "role": role,
+                    "content": content,
+                    "timestamp": datetime.now()
+                })
         except Exception as e:
             print(f"Error saving message to MongoDB: {e}")
     
-    def _convert_objectid_to_string(self, data: Any) -> Any:
+    async def get_user_context(self, user_id: str, user_data: Optional[Dict] = None) -> str:
         """
-        Convert ObjectId and datetime fields in data to strings.
-        Works with both dictionaries and lists.
+        Fetch all of the user's data from MongoDB and serialize it for the prompt.
+        Falls back to the passed user_data, then to a general note, if nothing is found.
+        """
+        # Get all user data directly from MongoDB with error handling
+        with metrics.stage("context_scan"):
+            all_user_data = await self._get_all_user_data_from_mongodb(user_id)
+        return self._serialize_context(user_id, all_user_data, user_data)
+    
+    async def get_user_contexts(self, user_ids: List[str]) -> Dict[str, str]:
+        """
+        Serialized prompt context for several users at once.
+        Uses one $in query per collection instead of one query per user and collection.
+        """
+        with metrics.stage("context_scan"):
+            data_by_user = await self._get_user_data_for_users_from_mongodb(user_ids)
+        return {
+            user_id: self._serialize_context(user_id, data_by_user.get(user_id))
+            for user_id in user_ids
+        }
+    
+    def _serialize_context(self, user_id: str, all_user_data: Optional[Dict], user_data: Optional[Dict] = None) -> str:
+        """Serialize the data found for a user, falling back to a general note."""
+        # If MongoDB retrieval fails, use the passed user_data as fallback
+        if not all_user_data or "error" in all_user_data:
+            if user_data and len(user_data) > 0:
+                all_user_data = user_data
+            else:
+                # Minimal context if no data is available
+                all_user_data = {"note": "No specific user data is available. Providing general financial advice."}
+        
+        with metrics.stage("serialize"):
+            # Serialize MongoDB documents (ObjectId, datetime, Decimal128) to compact JSON
+            # in one pass, capping large nested fields to avoid overwhelming the model
+            try:
+                return serialize_user_context(all_user_data, field_cap=CONTEXT_FIELD_CAP)
+            except Exception as e:
+                print(f"Error serializing user data: {str(e)}")
+                # Provide a simplified version if serialization fails
+                return json.dumps({"user_id": user_id, "note": "Error accessing detailed user data."})
+    
+    def _build_prompt(self, user_message: str, compact_data: str) -> str:
+        """Create the prompt with focus on answering regardless of data quality."""
+        return f"""
+        You are a professional financial assistant.
+        
+        Here is the available user data (if any): {compact_data}
+        
+        IMPORTANT: 
+        1. DO NOT reveal sensitive information like IDs, passwords, or full account numbers.
+        2. Provide helpful financial advice based on the data if available.
+        3. If no specific user data is available, provide general financial guidance.
+        4. Be conversational and friendly while remaining professional.
+        5. Remember previous parts of our conversation as context.
+        6. Always provide a helpful response even if data is limited.
+        7. Search the available data to answer the user's question. If no relevant information is found, provide guidance on how to achieve their goal within the application.
+
+        The application has the following features:
+        1. Contacts: Allows users to input and manage their customers
+        2. Expenses: Shows the expenses incurred by the user
+        3. Products: Allows users to add their products
+        4. Transactions: Shows the user's transaction history
+
+        User asks: {user_message}
         """
-        if isinstance(data, dict):
-            # Process dictionary
-            for key, value in list(data.items()):
-                if isinstance(value, ObjectId):
-                    data[key] = str(value)
-                elif isinstance(value, datetime):
-                    data[key] = value.isoformat()
-                elif isinstance(value, (dict, list)):
-                    data[key] = self._convert_objectid_to_string(value)
-            return data
-        elif isinstance(data, list):
-            # Process list
-            return [self._convert_objectid_to_string(item) for item in data]
-        else:
-            # Return unchanged for other types
-            return data
     
-    async def process_conversation(self, user_message: str, user_data: Dict, user_id: str) -> str:
+    async def process_conversation(self, user_message: str, user_data: Dict, user_id: str, context: Optional[str] = None) -> str:
         """
         Process user message with context from user data.
         Maintains conversation history in both memory and MongoDB.
+        A serialized context from get_user_context can be passed to skip the MongoDB scan.
         """
         try:
             # Save user message to MongoDB first (do this early to ensure it's saved even if we encounter errors)
@@ -176,68 +306,28 @@ class AIService:
                 return error_msg
             
             try:
-                # Get all user data directly from MongoDB with error handling
-                all_user_data = await self._get_all_user_data_from_mongodb(user_id)
-                
-                # If MongoDB retrieval fails, use the passed user_data as fallback
-                if not all_user_data or "error" in all_user_data:
-                    if user_data and len(user_data) > 0:
-                        all_user_data = user_data
-                    else:
-                        # Minimal context if no data is available
-                        all_user_data = {"note": "No specific user data is available. Providing general financial advice."}
-                
-                # Convert MongoDB-specific types to strings (handle potential errors)
-                try:
-                    all_user_data = self._convert_objectid_to_string(all_user_data)
-                except Exception as e:
-                    print(f"Error converting ObjectIds to strings: {str(e)}")
-                    # Provide a simplified version if conversion fails
-                    all_user_data = {"user_id": user_id, "note": "Error accessing detailed user data."}
-                
-                # Create the prompt with all user data - use a smaller JSON representation
-                # to avoid overwhelming the model
-                compact_data = json.dumps(all_user_data)
-                # if len(compact_data) > 8000:  # Truncate if too large
-                #     print(f"Warning: User data JSON is very large ({len(compact_data)} chars)")
-                #     compact_data = compact_data[:7500] + "... (truncated)"
-                
-                # Create the prompt with focus on answering regardless of data quality
-                prompt = f"""
-                You are a professional financial assistant.
-                
-                Here is the available user data (if any): {compact_data}
-                
-                IMPORTANT: 
-                1. DO NOT reveal sensitive information like IDs, passwords, or full account numbers.
-                2. Provide helpful financial advice based on the data if available.
-                3. If no specific user data is available, provide general financial guidance.
-                4. Be conversational and friendly while remaining professional.
-                5. Remember previous parts of our conversation as context.
-                6. Always provide a helpful response even if data is limited.
-                7. Search the available data to answer the user's question. If no relevant information is found, provide guidance on how to achieve their goal within the application.
-
-                The application has the following features:
-                1. Contacts: Allows users to input and manage their customers
-                2. Expenses: Shows the expenses incurred by the user
-                3. Products: Allows users to add their products
-                4. Transactions: Shows the user's transaction history
-
-                User asks: {user_message}
-                """
+                # Fetch and serialize the user's data unless the caller already holds it
+                compact_data = context if context is not None else await self.get_user_context(user_id, user_data)
+                prompt = self._build_prompt(user_message, compact_data)
                 
                 # Send message to AI with timeout handling
+                metrics.incr("prompt_bytes", len(prompt.encode("utf-8")))
                 try:
-                    response = chat.send_message(prompt)
+                    # One turn at a time per chat; then wait for a model slot shared fairly
+                    # between users and run the blocking SDK call off the event loop
+                    async with self._chat_lock(user_id):
+                        async with throttling.model_scheduler.slot(user_id):
+                            with metrics.stage("model"):
+                                response = await throttling.model_scheduler.call(chat.send_message, prompt)
                     ai_response = response.text.strip()
                     
                     # Check for empty response
                     if not ai_response:
-                        ai_response = "I understand your question but I'm having trouble formulating a response. Could you please rephrase your question or ask something more specific about your finances?"
+                        ai_response = EMPTY_RESPONSE_MESSAGE
                 except Exception as model_error:
                     print(f"Error from AI model: {str(model_error)}")
                     # Fallback response if AI model fails
-                    ai_response = "I apologize, but I'm having trouble processing your request right now. This may be due to a temporary issue with the AI service. Please try again shortly."
+                    ai_response = MODEL_ERROR_MESSAGE
                 
                 # Save assistant response to MongoDB
                 await self._save_message(user_id, "assistant", ai_response)
@@ -246,7 +336,7 @@ class AIService:
                 
             except Exception as inner_error:
                 print(f"Inner error in process_conversation: {str(inner_error)}")
-                fallback_response = "I'm having trouble accessing your financial data at the moment. Is there something general I can help you with about financial planning or advice?"
+                fallback_response = CONTEXT_ERROR_MESSAGE
                 await self._save_message(user_id, "assistant", fallback_response)
                 return fallback_response
                 
@@ -262,6 +352,107 @@ class AIService:
             
             return error_response
     
+    async def answer_once(self, user_message: str, user_id: str, context: Optional[str] = None, schedule_key: Optional[str] = None) -> str:
+        """
+        Answer a single message without a chat session, for batch jobs.
+        The user's chat is neither created nor replayed; one generate_content call is made,
+        scheduled fairly by `schedule_key` (default: the user ID). Errors are raised rather
+        than answered, and the exchange is saved to the history only when it succeeds.
+        """
+        if not AIService.initialize():
+            raise RuntimeError("Could not initialize AI model")
+        compact_data = context if context is not None else await self.get_user_context(user_id)
+        prompt = self._build_prompt(user_message, compact_data)
+        metrics.incr("prompt_bytes", len(prompt.encode("utf-8")))
+        async with throttling.model_scheduler.slot(schedule_key or user_id):
+            with metrics.stage("model"):
+                response = await throttling.model_scheduler.call(AIService.model.generate_content, prompt)
+        ai_response = response.text.strip() or EMPTY_RESPONSE_MESSAGE
+        await self._save_message(user_id, "user", user_message)
+        await self._save_message(user_id, "assistant", ai_response)
+        return ai_response
+    
+    async def stream_conversation(self, user_message: str, user_id: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Process a user message like process_conversation, yielding the response as it is generated.
+        The blocking SDK stream is read on a model thread into a buffer of WS_STREAM_BUFFER_CHUNKS,
+        and the model slot is released as soon as the model finishes, however slow the consumer is.
+        """
+        await self._save_message(user_id, "user", user_message)
+        
+        if not AIService.initialize():
+            error_msg = "Could not initialize AI model. Please check your API key."
+            await self._save_message(user_id, "assistant", error_msg)
+            yield error_msg
+            return
+        
+        chat = await self._get_or_create_chat(user_id)
+        if not chat:
+            error_msg = "Could not create chat session. Please try again later."
+            await self._save_message(user_id, "assistant", error_msg)
+            yield error_msg
+            return
+        
+        try:
+            compact_data = context if context is not None else await self.get_user_context(user_id)
+            prompt = self._build_prompt(user_message, compact_data)
+        except Exception as e:
+            print(f"Error building prompt for user {user_id}: {str(e)}")
+            await self._save_message(user_id, "assistant", CONTEXT_ERROR_MESSAGE)
+            yield CONTEXT_ERROR_MESSAGE
+            return
+        
+        metrics.incr("prompt_bytes", len(prompt.encode("utf-8")))
+        buffer = _ChunkBuffer(settings.WS_STREAM_BUFFER_CHUNKS)
+        
+        async def read_model_stream() -> None:
+            # Holds the chat lock and the model slot only while the model is generating;
+            # chunks are buffered, so a slow consumer does not keep the slot busy. The
+            # reply is saved here, so it is recorded even if the consumer has gone away.
+            texts = []
+            try:
+                scheduler = throttling.model_scheduler
+                async with self._chat_lock(user_id):
+                    try:
+                        async with scheduler.slot(user_id):
+                            with metrics.stage("model"):
+                                stream = await scheduler.call(chat.send_message, prompt, stream=True)
+                                iterator = iter(stream)
+                                # Read to the end even if the consumer has gone away: a half-read
+                                # stream leaves the chat session unusable for the next turn
+                                while True:
+                                    chunk = await scheduler.call(next, iterator, None)
+                                    if chunk is None:
+                                        break
+                                    if chunk.text:
+                                        texts.append(chunk.text)
+                                        buffer.put(chunk.text)
+                    except Exception as model_error:
+                        print(f"Error from AI model: {str(model_error)}")
+                        # A failed stream breaks the SDK chat session for every later turn; drop it
+                        # so the next turn rebuilds it from the saved history
+                        if AIService.chats.get(user_id) is chat:
+                            del AIService.chats[user_id]
+                        if not texts:
+                            texts.append(MODEL_ERROR_MESSAGE)
+                            buffer.put(MODEL_ERROR_MESSAGE)
+                ai_response = "".join(texts).strip()
+                if not ai_response:
+                    ai_response = EMPTY_RESPONSE_MESSAGE
+                    buffer.put(ai_response)
+                await self._save_message(user_id, "assistant", ai_response)
+            finally:
+                buffer.close()
+        
+        task = asyncio.create_task(read_model_stream())
+        AIService._stream_tasks.add(task)
+        task.add_done_callback(AIService._stream_tasks.discard)
+        while True:
+            text = await buffer.get()
+            if text is None:
+                break
+            yield text
+    
     async def _get_all_user_data_from_mongodb(self, user_id: str) -> Dict:
         """
         Retrieve all data related to the user directly from MongoDB.
@@ -274,9 +465,8 @@ class AIService:
             # Get list of all collections in the database
             collections = await db.list_collection_names()
             
-            # Skip conversation_history collection as it's not user data
-            if 'conversation_history' in collections:
-                collections.remove('conversation_history')
+            # Skip conversation history collections as they're not user data
+            collections = [name for name in collections if name not in HISTORY_COLLECTIONS]
             
             # Query all collections for any data related to this user ID
             for collection_name in collections:
@@ -312,20 +502,9 @@ class AIService:
                     docs = await collection.find(id_query).limit(10).to_list(10)
                     
                     if docs and len(docs) > 0:
-                        # Keep data structures from growing too large
-                        if len(docs) > 1:
-                            # For multiple documents, only keep essential fields
-                            simplified_docs = []
-                            for doc in docs:
-                                # Filter large fields to keep data manageable
-                                simplified_doc = {k: v for k, v in doc.items() 
-                                                if not isinstance(v, (dict, list)) or 
-                                                   (isinstance(v, (dict, list)) and len(str(v)) < 1000)}
-                                simplified_docs.append(simplified_doc)
-                            all_user_data[collection_name] = simplified_docs
-                        else:
-                            # For single document, keep as is
-                            all_user_data[collection_name] = docs[0]
+                        # Multiple documents are kept as a list; their large nested fields
+                        # are dropped by serialize_user_context while the prompt is written
+                        all_user_data[collection_name] = docs if len(docs) > 1 else docs[0]
                         continue
                     
                     # Skip text search as it's error-prone and may not be configured
@@ -346,25 +525,103 @@ class AIService:
             # Return a minimal data structure rather than an empty dict
             return {"error": "Could not retrieve user data", "user_id": user_id}
     
+    async def _get_user_data_for_users_from_mongodb(self, user_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Bulk version of _get_all_user_data_from_mongodb.
+        Matches the same ID fields with $in queries and keeps at most 10 documents
+        per user and collection. Each $in query reads at most 10 documents per user;
+        when that cap is reached, users left with fewer are read with their own
+        limited queries. Users without data get the same friendly message.
+        """
+        results: Dict[str, Dict] = {user_id: {} for user_id in user_ids}
+        try:
+            db = MongoDB.get_db()
+            
+            # Map every (field, value) a document may carry back to the user it belongs to,
+            # using the same ID formats as the single-user query
+            owners = {}
+            user_queries = {}
+            for user_id in user_ids:
+                try:
+                    obj_id = ObjectId(user_id)
+                    keys = [("_id", obj_id), ("user_id", obj_id), ("userId", obj_id), ("userId", user_id)]
+                except Exception:
+                    keys = [("_id", user_id), ("user_id", user_id), ("userId", user_id)]
+                for key in keys:
+                    owners[key] = user_id
+                user_queries[user_id] = {"$or": [{field: value} for field, value in keys]}
+            
+            values_by_field: Dict[str, list] = {}
+            for field, value in owners:
+                values_by_field.setdefault(field, []).append(value)
+            id_query = {"$or": [{field: {"$in": values}} for field, values in values_by_field.items()]}
+            
+            collections = [name for name in await db.list_collection_names() if name not in HISTORY_COLLECTIONS]
+            cap = 10 * len(user_ids)
+            
+            for collection_name in collections:
+                try:
+                    docs_by_user: Dict[str, list] = {}
+                    full_users = 0
+                    fetched = 0
+                    async for doc in db[collection_name].find(id_query).limit(cap):
+                        fetched += 1
+                        user_id = None
+                        for field in ("_id", "user_id", "userId"):
+                            value = doc.get(field)
+                            if isinstance(value, (str, ObjectId)):
+                                user_id = owners.get((field, value))
+                                if user_id is not None:
+                                    break
+                        if user_id is None:
+                            continue
+                        docs = docs_by_user.setdefault(user_id, [])
+                        if len(docs) < 10:
+                            docs.append(doc)
+                            if len(docs) == 10:
+                                full_users += 1
+                                if full_users == len(user_ids):
+                                    break
+                    if fetched == cap:
+                        # Users with many documents can fill the cap before others are reached
+                        short = [user_id for user_id in user_ids if len(docs_by_user.get(user_id, ())) < 10]
+                        found = await asyncio.gather(*(
+                            db[collection_name].find(user_queries[user_id]).limit(10).to_list(10) for user_id in short
+                        ))
+                        for user_id, docs in zip(short, found):
+                            if docs:
+                                docs_by_user[user_id] = docs
+                    for user_id, docs in docs_by_user.items():
+                        results[user_id][collection_name] = docs if len(docs) > 1 else docs[0]
+                except Exception as e:
+                    print(f"Error querying collection {collection_name}: {str(e)}")
+                    continue
+        except Exception as e:
+            print(f"Error retrieving bulk user data from MongoDB: {str(e)}")
+            return {user_id: {"error": "Could not retrieve user data", "user_id": user_id} for user_id in user_ids}
+        
+        for user_id, data in results.items():
+            if not data:
+                results[user_id] = {"message": "No user data found. I can still help with general financial questions."}
+        return results
+    
     async def get_conversation_history(self, user_id: str) -> List[Dict]:
         """
         Get the conversation history for a user from MongoDB.
         Returns a list of messages in the format expected by the frontend.
         """
         try:
-            db = MongoDB.get_db()
-            # Query for records with either user_id or userId fields
-            messages = await db.conversation_history.find(
-                {"$or": [{"user_id": user_id}, {"userId": user_id}]}
-            ).sort("timestamp", 1).to_list(100)  # Sort by timestamp ascending
+            # Oldest 100 messages across the archive and recent messages
+            with metrics.stage("history_fetch"):
+                messages = await HistoryService.oldest_messages(user_id, 100)
             
-            # Format for frontend
+            # Format for frontend; missing timestamps default to now, as MessageSchema does
             history = []
             for msg in messages:
                 history.append({
                     "role": msg.get("role"),
                     "content": msg.get("content"),
-                    "timestamp": msg.get("timestamp")
+                    "timestamp": msg.get("timestamp") or datetime.now()
                 })
             
             return history
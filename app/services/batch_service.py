@@ -0,0 +1,139 @@
+from app.db.mongodb import MongoDB
+from app.services.ai_service import AIService
+from app.core.config import settings
+from app.core.serialization import dumps
+from typing import Optional, Dict, List, Any, AsyncIterator, Tuple
+from datetime import datetime
+import asyncio
+import hashlib
+import time
+import uuid
+
+class BatchService:
+    @staticmethod
+    def _digest(items: List[Any]) -> str:
+        """Fingerprint of the ordered (user_id, message) pairs a job was started with."""
+        digest = hashlib.sha256()
+        for item in items:
+            digest.update((dumps([item.user_id, item.message]) + "\n").encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    async def load_job(items: List[Any], job_id: Optional[str] = None) -> Optional[Tuple[str, set]]:
+        """
+        Return the job ID and the indexes already completed by a previous run of it.
+        Returns None if job_id belongs to a job started with different items, since
+        its completed indexes would skip unrelated items.
+        """
+        if not job_id:
+            job_id = uuid.uuid4().hex
+        digest = BatchService._digest(items)
+        try:
+            db = MongoDB.get_db()
+            job = await db.batch_jobs.find_one({"_id": job_id})
+            if job:
+                if job.get("digest") != digest:
+                    return None
+                return job_id, set(job.get("completed", []))
+            await db.batch_jobs.update_one(
+                {"_id": job_id},
+                {"$setOnInsert": {"total": len(items), "digest": digest, "created_at": datetime.now(), "completed": []}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error loading batch job {job_id}: {e}")
+        return job_id, set()
+
+    @staticmethod
+    async def _record_progress(job_id: str, indexes: List[int]) -> None:
+        """Persist completed item indexes so the job can be resumed."""
+        try:
+            db = MongoDB.get_db()
+            await db.batch_jobs.update_one(
+                {"_id": job_id},
+                {"$addToSet": {"completed": {"$each": indexes}}, "$set": {"updated_at": datetime.now()}}
+            )
+        except Exception as e:
+            print(f"Error recording progress for batch job {job_id}: {e}")
+
+    @staticmethod
+    async def run(items: List[Any], job_id: str, completed: set, concurrency: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Process (user_id, message) items of a job from load_job and yield events as they complete.
+
+        Items are handled in chunks of BATCH_CHUNK_SIZE: the contexts of all users
+        in a chunk are fetched with bulk $in queries, then model calls run
+        concurrently up to `concurrency`. Messages of the same user run in order,
+        one at a time. Each item is a single model call without the user's chat
+        session. Progress is saved after every chunk, so a job resumed with the
+        same job_id and items skips the items that succeeded and retries failed
+        ones; items of an interrupted chunk may be processed again.
+        """
+        started = time.perf_counter()
+        limit = min(concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+        pending = [index for index in range(len(items)) if index not in completed]
+        yield {"type": "job", "job_id": job_id, "total": len(items), "already_completed": len(items) - len(pending)}
+
+        ai_service = AIService()
+        semaphore = asyncio.Semaphore(limit)
+        done = len(items) - len(pending)
+        failed = 0
+
+        for chunk_start in range(0, len(pending), settings.BATCH_CHUNK_SIZE):
+            chunk = pending[chunk_start:chunk_start + settings.BATCH_CHUNK_SIZE]
+            by_user: Dict[str, List[int]] = {}
+            for index in chunk:
+                by_user.setdefault(items[index].user_id, []).append(index)
+            contexts = await ai_service.get_user_contexts(list(by_user))
+            results: asyncio.Queue = asyncio.Queue()
+
+            async def run_user(user_id: str, indexes: List[int]) -> None:
+                for index in indexes:
+                    try:
+                        async with semaphore:
+                            response = await ai_service.answer_once(
+                                user_message=items[index].message,
+                                user_id=user_id,
+                                context=contexts.get(user_id),
+                                # The whole job shares one fair share of model slots with interactive users
+                                schedule_key=f"batch:{job_id}"
+                            )
+                        await results.put({"type": "result", "index": index, "user_id": user_id, "response": response, "success": True})
+                    except Exception as e:
+                        print(f"Error processing batch item {index} for user {user_id}: {e}")
+                        await results.put({"type": "result", "index": index, "user_id": user_id, "success": False, "error": str(e)})
+
+            tasks = [asyncio.create_task(run_user(user_id, indexes)) for user_id, indexes in by_user.items()]
+            succeeded = []
+            try:
+                for _ in range(len(chunk)):
+                    event = await results.get()
+                    if event["success"]:
+                        succeeded.append(event["index"])
+                    else:
+                        failed += 1
+                    yield event
+            finally:
+                # Stop outstanding work if the client went away mid-chunk
+                for task in tasks:
+                    task.cancel()
+            # Failed items are left out, so resuming the job retries them
+            if succeeded:
+                await BatchService._record_progress(job_id, succeeded)
+            done += len(succeeded)
+            yield {"type": "progress", "job_id": job_id, "completed": done, "total": len(items)}
+
+        yield {
+            "type": "done",
+            "job_id": job_id,
+            "completed": done,
+            "failed": failed,
+            "total": len(items),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)
+        }
+
+    @staticmethod
+    async def stream_ndjson(items: List[Any], job_id: str, completed: set, concurrency: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Encode batch events as newline-delimited JSON."""
+        async for event in BatchService.run(items, job_id, completed, concurrency):
+            yield (dumps(event) + "\n").encode("utf-8")
@@ -0,0 +1,222 @@
+from app.db.mongodb import MongoDB
+from app.core.config import settings
+from app.core import metrics
+from app.core.metrics import registry as metrics_registry
+from app.core.serialization import dumpb
+from bson import Binary
+from pymongo.errors import OperationFailure
+from typing import Optional, Dict, List
+from datetime import datetime, timedelta
+import asyncio
+import json
+import zlib
+
+# Recent messages, one document per message
+HISTORY_COLLECTION = "conversation_history"
+# Older messages, compressed into buckets of up to HISTORY_ARCHIVE_BUCKET_SIZE messages per user
+ARCHIVE_COLLECTION = "conversation_archive"
+# Collections that hold conversation history rather than user data
+HISTORY_COLLECTIONS = (HISTORY_COLLECTION, ARCHIVE_COLLECTION)
+
+_archiver_task: Optional[asyncio.Task] = None
+
+
+def _user_query(user_id: str) -> Dict:
+    # Messages carry user_id, userId or both depending on who wrote them
+    return {"$or": [{"user_id": user_id}, {"userId": user_id}]}
+
+
+def _pack(messages: List[Dict]) -> Binary:
+    return Binary(zlib.compress(dumpb(messages), 6))
+
+
+def _unpack(bucket: Dict) -> List[Dict]:
+    messages = json.loads(zlib.decompress(bucket["messages"]))
+    for message in messages:
+        if message.get("timestamp"):
+            message["timestamp"] = datetime.fromisoformat(message["timestamp"])
+    return messages
+
+
+class HistoryService:
+    @staticmethod
+    def archive_enabled() -> bool:
+        return bool(settings.HISTORY_ARCHIVE_AFTER_DAYS)
+
+    @staticmethod
+    async def _ensure_ttl_index(collection, field: str) -> None:
+        """
+        Index `field`, expiring documents after HISTORY_RETENTION_DAYS when it is set.
+        An existing index is switched to the configured retention with collMod.
+        """
+        name = f"{field}_1"
+        options = {}
+        if settings.HISTORY_RETENTION_DAYS:
+            options["expireAfterSeconds"] = int(settings.HISTORY_RETENTION_DAYS * 86400)
+        try:
+            await collection.create_index(field, name=name, **options)
+        except OperationFailure:
+            if not options:
+                print(f"Keeping the existing TTL index on {collection.name}.{field}; drop it to stop expiring history")
+                return
+            await MongoDB.get_db().command("collMod", collection.name, index={"name": name, **options})
+
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create the indexes used by history reads, archiving and retention."""
+        try:
+            db = MongoDB.get_db()
+            history = db[HISTORY_COLLECTION]
+            await history.create_index([("user_id", 1), ("timestamp", -1)])
+            await history.create_index([("userId", 1), ("timestamp", -1)])
+            await HistoryService._ensure_ttl_index(history, "timestamp")
+            archive = db[ARCHIVE_COLLECTION]
+            await archive.create_index([("user_id", 1), ("start", 1)])
+            await HistoryService._ensure_ttl_index(archive, "end")
+        except Exception as e:
+            print(f"Error creating conversation history indexes: {e}")
+
+    @staticmethod
+    async def recent_messages(user_id: str, limit: int = 50) -> List[Dict]:
+        """The user's newest `limit` messages in chronological order, topped up from the archive."""
+        db = MongoDB.get_db()
+        messages = await db[HISTORY_COLLECTION].find(
+            _user_query(user_id)
+        ).sort("timestamp", -1).limit(limit).to_list(limit)
+        messages.reverse()
+
+        missing = limit - len(messages)
+        if missing > 0:
+            older = []
+            async for bucket in db[ARCHIVE_COLLECTION].find({"user_id": user_id}).sort("start", -1):
+                metrics.incr("history_archive_buckets")
+                older = _unpack(bucket) + older
+                if len(older) >= missing:
+                    break
+            messages = older[-missing:] + messages
+        return messages
+
+    @staticmethod
+    async def oldest_messages(user_id: str, limit: int = 100) -> List[Dict]:
+        """The user's first `limit` messages in chronological order, across both tiers."""
+        db = MongoDB.get_db()
+        messages = []
+        # Buckets stay readable after archiving is turned off
+        async for bucket in db[ARCHIVE_COLLECTION].find({"user_id": user_id}).sort("start", 1):
+            metrics.incr("history_archive_buckets")
+            messages.extend(_unpack(bucket))
+            if len(messages) >= limit:
+                return messages[:limit]
+        remaining = limit - len(messages)
+        messages.extend(await db[HISTORY_COLLECTION].find(
+            _user_query(user_id)
+        ).sort("timestamp", 1).to_list(remaining))
+        return messages
+
+    @staticmethod
+    async def delete_user(user_id: str) -> None:
+        """Delete a user's messages from both tiers."""
+        db = MongoDB.get_db()
+        await db[HISTORY_COLLECTION].delete_many(_user_query(user_id))
+        await db[ARCHIVE_COLLECTION].delete_many({"user_id": user_id})
+
+    @staticmethod
+    async def archive_user(user_id: str, cutoff: datetime) -> int:
+        """
+        Move the user's messages older than `cutoff` into compressed archive buckets.
+
+        Buckets are keyed by their first message's _id and inserted before the
+        messages are deleted, so an interrupted run can simply be repeated. Only
+        the messages recorded in the stored bucket are deleted: a repeated run
+        may select more messages under the same key (e.g. with a later cutoff),
+        and those stay in the hot collection for the next bucket.
+        Returns the number of messages archived.
+        """
+        db = MongoDB.get_db()
+        query = {"$and": [_user_query(user_id), {"timestamp": {"$lt": cutoff}}]}
+        archived = 0
+        while True:
+            docs = await db[HISTORY_COLLECTION].find(query).sort("timestamp", 1).limit(
+                settings.HISTORY_ARCHIVE_BUCKET_SIZE
+            ).to_list(settings.HISTORY_ARCHIVE_BUCKET_SIZE)
+            if not docs:
+                return archived
+            messages = [
+                {"role": doc.get("role"), "content": doc.get("content"), "timestamp": doc.get("timestamp")}
+                for doc in docs
+            ]
+            bucket_id = f"{user_id}:{docs[0]['_id']}"
+            await db[ARCHIVE_COLLECTION].update_one(
+                {"_id": bucket_id},
+                {"$setOnInsert": {
+                    "user_id": user_id,
+                    "start": docs[0].get("timestamp"),
+                    "end": docs[-1].get("timestamp"),
+                    "count": len(messages),
+                    "ids": [doc["_id"] for doc in docs],
+                    "messages": _pack(messages)
+                }},
+                upsert=True
+            )
+            bucket = await db[ARCHIVE_COLLECTION].find_one({"_id": bucket_id}, {"ids": 1})
+            ids = bucket["ids"]
+            await db[HISTORY_COLLECTION].delete_many({"_id": {"$in": ids}})
+            archived += len(ids)
+
+    @staticmethod
+    async def archive_old_messages(batch_size: int = 1000) -> int:
+        """
+        Archive every message older than HISTORY_ARCHIVE_AFTER_DAYS.
+        Owners are found by scanning the oldest messages (timestamp index) in batches.
+        """
+        if not HistoryService.archive_enabled():
+            return 0
+        cutoff = datetime.now() - timedelta(days=settings.HISTORY_ARCHIVE_AFTER_DAYS)
+        db = MongoDB.get_db()
+        total = 0
+        while True:
+            # Legacy messages without an owner are never archived, so they must not fill the batch
+            docs = await db[HISTORY_COLLECTION].find(
+                {
+                    "timestamp": {"$lt": cutoff},
+                    "$or": [{"user_id": {"$exists": True}}, {"userId": {"$exists": True}}]
+                },
+                {"user_id": 1, "userId": 1}
+            ).sort("timestamp", 1).limit(batch_size).to_list(batch_size)
+            user_ids = {doc.get("user_id") or doc.get("userId") for doc in docs}
+            user_ids.discard(None)
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                total += await HistoryService.archive_user(user_id, cutoff)
+        if total:
+            metrics_registry.events.inc("history_archived_messages", amount=total)
+            print(f"Archived {total} conversation messages older than {cutoff:%Y-%m-%d}")
+        return total
+
+    @staticmethod
+    async def _archive_forever() -> None:
+        while True:
+            try:
+                await HistoryService.archive_old_messages()
+            except Exception as e:
+                print(f"Error archiving conversation history: {e}")
+            await asyncio.sleep(settings.HISTORY_ARCHIVE_INTERVAL)
+
+    @staticmethod
+    def start_archiver() -> None:
+        """Archive old messages periodically in this worker."""
+        global _archiver_task
+        if HistoryService.archive_enabled() and settings.HISTORY_ARCHIVE_INTERVAL > 0 and _archiver_task is None:
+            _archiver_task = asyncio.create_task(HistoryService._archive_forever())
+
+    @staticmethod
+    async def stop_archiver() -> None:
+        global _archiver_task
+        if _archiver_task is not None:
+            _archiver_task.cancel()
+            try:
+                await _archiver_task
+            except asyncio.CancelledError:
+                pass
+            _archiver_task = None
@@ -0,0 +1,75 @@
+from app.db.mongodb import MongoDB
+from app.services.ai_service import AIService
+from app.services.history_service import HistoryService, HISTORY_COLLECTION
+from app.core.config import settings
+from typing import Dict, List
+import asyncio
+import time
+
+class WarmupService:
+    @staticmethod
+    async def _timed(name: str, coro, timings: Dict[str, float]) -> None:
+        start = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            print(f"Error during warm-up step {name}: {e}")
+        timings[name] = round((time.perf_counter() - start) * 1000.0, 1)
+
+    @staticmethod
+    async def preconnect_mongo(connections: int) -> None:
+        """Open pool connections up front; concurrent pings each check out their own connection."""
+        client = MongoDB.get_client()
+        await asyncio.gather(*(client.admin.command('ping') for _ in range(connections)))
+
+    @staticmethod
+    async def recent_user_ids(limit: int) -> List[str]:
+        """Users with the most recent conversation messages, newest first."""
+        db = MongoDB.get_db()
+        user_ids: List[str] = []
+        async for doc in db[HISTORY_COLLECTION].find(
+            {}, {"user_id": 1, "userId": 1}
+        ).sort("timestamp", -1).limit(limit * 20):
+            user_id = doc.get("user_id") or doc.get("userId")
+            if user_id and user_id not in user_ids:
+                user_ids.append(user_id)
+                if len(user_ids) == limit:
+                    break
+        return user_ids
+
+    @staticmethod
+    async def prewarm_users(limit: int) -> None:
+        """
+        Read the data the first request of each recently active user needs (context
+        and recent history), so MongoDB serves it from memory when they come back.
+        """
+        user_ids = await WarmupService.recent_user_ids(limit)
+        ai_service = AIService()
+        for start in range(0, len(user_ids), settings.BATCH_CHUNK_SIZE):
+            chunk = user_ids[start:start + settings.BATCH_CHUNK_SIZE]
+            await ai_service.get_user_contexts(chunk)
+            await asyncio.gather(*(HistoryService.recent_messages(user_id, 50) for user_id in chunk))
+
+    @staticmethod
+    async def run(mongo_connected: bool = True) -> Dict[str, float]:
+        """
+        Warm up the worker before it serves traffic: set up the model with its system
+        prompt and open its connection, fill the MongoDB pool and optionally read
+        recent users' data. The MongoDB steps are skipped when it is not connected.
+        Returns the duration of each step in milliseconds.
+        """
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        # The model (which loads the system prompt) and MongoDB are independent, so warm both at once
+        steps = [WarmupService._timed("model", AIService.warm_up(), timings)]
+        if mongo_connected:
+            steps.append(WarmupService._timed(
+                "mongo_pool", WarmupService.preconnect_mongo(settings.WARMUP_MONGO_CONNECTIONS), timings
+            ))
+        await asyncio.gather(*steps)
+        if mongo_connected and settings.WARMUP_RECENT_USERS > 0:
+            await WarmupService._timed("recent_users", WarmupService.prewarm_users(settings.WARMUP_RECENT_USERS), timings)
+
+        timings["total"] = round((time.perf_counter() - start) * 1000.0, 1)
+        print("Warm-up finished: " + ", ".join(f"{name}={ms}ms" for name, ms in timings.items()))
+        return timings
@@ -0,0 +1 @@
+"""Local benchmark and load-test suite for the Smartfin AI API."""
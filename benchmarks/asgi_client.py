@@ -0,0 +1,158 @@
+"""
+Minimal in-process ASGI client.
+
+Calls the FastAPI app directly without a socket or an HTTP client library so
+the benchmarks measure the application rather than the transport.
+"""
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class ASGIResponse:
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in headers}
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+async def request(
+    app,
+    method: str,
+    url: str,
+    json_body: Optional[Dict] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> ASGIResponse:
+    """Send one HTTP request through the ASGI app and collect the full response."""
+    parts = urlsplit(url)
+    body = b"" if json_body is None else json.dumps(json_body).encode("utf-8")
+    raw_headers = [(b"host", b"bench.local")]
+    if json_body is not None:
+        raw_headers.append((b"content-type", b"application/json"))
+    raw_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+    for key, value in (headers or {}).items():
+        raw_headers.append((key.lower().encode("latin-1"), value.encode("latin-1")))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method.upper(),
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode("latin-1"),
+        "query_string": parts.query.encode("latin-1"),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench.local", 80),
+    }
+
+    request_sent = False
+    status = 500
+    response_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+
+    response_complete = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Like a real server, only report a disconnect once the response is finished
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    await app(scope, receive, send)
+    return ASGIResponse(status, response_headers, b"".join(chunks))
+
+
+class WebSocketClient:
+    """In-process WebSocket connection to an ASGI app."""
+
+    def __init__(self, app, path: str):
+        self.app = app
+        self.path = path
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        self.close_code = None
+
+    async def connect(self) -> bool:
+        """Open the connection; returns False if the app closed it instead of accepting."""
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "scheme": "ws",
+            "path": self.path,
+            "raw_path": self.path.encode("latin-1"),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"bench.local")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench.local", 80),
+            "subprotocols": [],
+        }
+        await self._to_app.put({"type": "websocket.connect"})
+        self._task = asyncio.create_task(self.app(scope, self._to_app.get, self._from_app.put))
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            self.close_code = message.get("code", 1000)
+            return False
+        return message["type"] == "websocket.accept"
+
+    async def send_json(self, payload: Dict) -> None:
+        await self._to_app.put({"type": "websocket.receive", "text": json.dumps(payload)})
+
+    async def receive_json(self) -> Dict:
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            self.close_code = message.get("code", 1000)
+            raise ConnectionError(f"WebSocket closed with code {self.close_code}")
+        return json.loads(message.get("text") or message.get("bytes"))
+
+    async def close(self) -> None:
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        if self._task is not None:
+            await self._task
+
+
+class Lifespan:
+    """Runs the app's startup and shutdown handlers through the ASGI lifespan protocol."""
+
+    def __init__(self, app):
+        self.app = app
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task = None
+
+    async def _send(self, message_type: str) -> None:
+        await self._to_app.put({"type": message_type})
+        message = await self._from_app.get()
+        if message["type"].endswith(".failed"):
+            raise RuntimeError(message.get("message") or message["type"])
+
+    async def startup(self) -> None:
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._task = asyncio.create_task(self.app(scope, self._to_app.get, self._from_app.put))
+        await self._send("lifespan.startup")
+
+    async def shutdown(self) -> None:
+        await self._send("lifespan.shutdown")
+        await self._task
@@ -0,0 +1,309 @@
+"""
+End-to-end benchmark for the conversation API.
+
+Drives the FastAPI app in-process against an in-memory Mongo stand-in (or a
+local MongoDB when --mongo-uri is given) and a stub Gemini model, and reports
+latency percentiles, throughput, Mongo operations per request and prompt bytes
+per request for each endpoint.
+
+Usage:
+    python -m benchmarks.bench_api
+    python -m benchmarks.bench_api --concurrency 32 --users 200 --docs-per-user 50
+    python -m benchmarks.bench_api --compare benchmarks/baseline.json
+    python -m benchmarks.bench_api --save-baseline benchmarks/baseline.local.json
+    python -m benchmarks.bench_api --compare benchmarks/baseline.local.json
+
+The committed baseline.json holds only the deterministic counts (recorded with
+--counts-only), so comparing against it never fails on machine speed; latency
+is gated against a baseline recorded on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+# Settings are validated at import time; the benchmark never talks to real services
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+
+from benchmarks.asgi_client import request  # noqa: E402
+from benchmarks.fakes import FakeMongoClient, OpCounter, StubModel, generate_dataset, load_dataset  # noqa: E402
+
+SCENARIOS = ["message", "history", "clear", "users_sample", "health"]
+
+# Metrics compared against a saved baseline, and whether they are latency-like
+# (noisy, compared with --tolerance) or counts (deterministic, --count-tolerance)
+COMPARED_METRICS = {
+    "p50_ms": "latency",
+    "p95_ms": "latency",
+    "p99_ms": "latency",
+    "mongo_ops_per_request": "count",
+    "prompt_bytes_per_request": "count",
+}
+
+
+class _CommandCounter:
+    """pymongo command listener that feeds an OpCounter when running against a real server."""
+
+    def __init__(self, counter: OpCounter):
+        self.counter = counter
+
+    def started(self, event):
+        self.counter.record(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Parse a Server-Timing header into stage name -> milliseconds."""
+    stages = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        if name and params.startswith("dur="):
+            stages[name] = float(params[4:])
+    return stages
+
+
+async def _setup(args) -> Dict:
+    from app.core import metrics
+    from app.db.mongodb import MongoDB
+    from app.services.ai_service import AIService
+
+    # Feed the app's own round-trip metric the same way the pymongo listener does
+    counter = OpCounter(on_record=lambda name: metrics.incr("mongo_round_trips"))
+    model = StubModel(latency=args.model_latency)
+    user_ids, collections = generate_dataset(args.users, args.docs_per_user, args.history)
+
+    if args.mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        # The OpCounter listener already forwards to the app metrics via on_record
+        client = AsyncIOMotorClient(args.mongo_uri, event_listeners=[_CommandCounter(counter)])
+        db = client[args.mongo_db]
+        await load_dataset(db, collections, drop=True)
+    else:
+        client = FakeMongoClient(args.mongo_db, counter)
+        db = client[args.mongo_db]
+        await load_dataset(db, collections)
+
+    MongoDB.client = client
+    MongoDB.db = db
+    AIService.model = model
+    AIService.chats.clear()
+    counter.reset()
+    return {"counter": counter, "model": model, "user_ids": user_ids, "client": client}
+
+
+def _scenario_request(name: str, user_ids: List[str]) -> Callable[[int], tuple]:
+    def build(i: int) -> tuple:
+        user_id = user_ids[i % len(user_ids)]
+        if name == "message":
+            body = {"message": f"How much did I spend on food last month? ({i})"}
+            return "POST", f"/api/v1/conversation/{user_id}", body
+        if name == "history":
+            return "POST", f"/api/v1/conversation/{user_id}", {"message": "", "operation": "history"}
+        if name == "clear":
+            return "POST", f"/api/v1/conversation/{user_id}", {"message": "", "operation": "clear"}
+        if name == "users_sample":
+            return "GET", "/api/v1/users/sample?limit=5", None
+        if name == "health":
+            return "GET", "/api/v1/health", None
+        raise ValueError(f"Unknown scenario: {name}")
+    return build
+
+
+async def run_scenario(app, name: str, env: Dict, args) -> Dict:
+    build = _scenario_request(name, env["user_ids"])
+    counter: OpCounter = env["counter"]
+    model: StubModel = env["model"]
+    headers = {"accept-encoding": args.accept_encoding} if args.accept_encoding else None
+
+    for i in range(args.warmup):
+        method, path, body = build(i)
+        await request(app, method, path, body)
+
+    counter.reset()
+    model.reset()
+    latencies: List[float] = []
+    stage_totals: Dict[str, float] = {}
+    response_bytes = 0
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors, response_bytes
+        while next_index < args.requests:
+            i = next_index
+            next_index += 1
+            method, path, body = build(args.warmup + i)
+            start = time.perf_counter()
+            response = await request(app, method, path, body, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            response_bytes += len(response.body)
+            if response.status >= 400:
+                errors += 1
+            for name, duration in parse_server_timing(response.headers.get("server-timing", "")).items():
+                stage_totals[name] = stage_totals.get(name, 0.0) + duration
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    completed = len(latencies)
+
+    return {
+        "requests": completed,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+        "mongo_ops_per_request": round(counter.total / completed, 2) if completed else 0.0,
+        "mongo_ops_breakdown": dict(counter.ops),
+        "model_calls_per_request": round(model.calls / completed, 2) if completed else 0.0,
+        "prompt_bytes_per_request": round(model.prompt_bytes / completed, 1) if completed else 0.0,
+        "response_bytes_per_request": round(response_bytes / completed, 1) if completed else 0.0,
+        "stage_mean_ms": {name: round(total / completed, 3) for name, total in stage_totals.items()} if completed else {},
+    }
+
+
+# Machine-dependent results left out of a --counts-only baseline
+LATENCY_FIELDS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "throughput_rps", "stage_mean_ms")
+
+
+def counts_only(results: Dict) -> Dict:
+    """Strip the latency results, keeping what is deterministic for a given configuration."""
+    return {
+        **results,
+        "counts_only": True,
+        "scenarios": {
+            name: {k: v for k, v in scenario.items() if k not in LATENCY_FIELDS}
+            for name, scenario in results["scenarios"].items()
+        },
+    }
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float, count_tolerance: float) -> List[str]:
+    """Return a human-readable line for every metric that regressed beyond its tolerance."""
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        for metric, kind in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            allowed = tolerance if kind == "latency" else count_tolerance
+            if new > old * (1 + allowed) and new - old > 1e-9:
+                change = ((new - old) / old * 100.0) if old else float("inf")
+                regressions.append(f"{scenario}.{metric}: {old} -> {new} (+{change:.1f}%)")
+    return regressions
+
+
+def print_report(results: Dict) -> None:
+    header = f"{'scenario':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'mongo/req':>11}{'prompt B/req':>14}{'resp B/req':>12}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results["scenarios"].items():
+        print(
+            f"{name:<14}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{r['throughput_rps']:>10.1f}{r['mongo_ops_per_request']:>11.2f}"
+            f"{r['prompt_bytes_per_request']:>14.1f}{r.get('response_bytes_per_request', 0.0):>12.1f}{r['errors']:>8}"
+        )
+        stages = {k: v for k, v in r.get("stage_mean_ms", {}).items() if k != "total"}
+        if stages:
+            print("  " + "  ".join(f"{k}={v:.2f}ms" for k, v in sorted(stages.items(), key=lambda kv: -kv[1])))
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Smartfin AI conversation API in-process.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent in-flight requests")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario")
+    parser.add_argument("--users", type=int, default=50, help="Number of seeded users")
+    parser.add_argument("--docs-per-user", type=int, default=20, help="Financial documents seeded per user and collection")
+    parser.add_argument("--history", type=int, default=20, help="Conversation messages seeded per user")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="Simulated model latency in seconds")
+    parser.add_argument("--accept-encoding", default="", help="Accept-Encoding sent with every request, e.g. 'br, gzip'")
+    parser.add_argument("--mongo-uri", default=None, help="Run against a local MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--mongo-db", default="smartfin_bench", help="Database name to seed (dropped and re-seeded)")
+    parser.add_argument("--json", dest="json_out", default=None, help="Write full results to this file")
+    parser.add_argument("--save-baseline", default=None, help="Save results as the baseline at this path")
+    parser.add_argument("--counts-only", action="store_true",
+                        help="Save only Mongo ops, prompt bytes and other counts, for a baseline shared between machines")
+    parser.add_argument("--compare", default=None, help="Compare against the baseline at this path")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative latency regression")
+    parser.add_argument("--count-tolerance", type=float, default=0.05, help="Allowed relative regression for Mongo ops and prompt bytes")
+    args = parser.parse_args(argv)
+
+    from app.main import app
+
+    env = await _setup(args)
+    results = {
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "users": args.users,
+            "docs_per_user": args.docs_per_user,
+            "history": args.history,
+            "model_latency": args.model_latency,
+            "accept_encoding": args.accept_encoding,
+            "backend": "mongodb" if args.mongo_uri else "in-memory",
+            "python": sys.version.split()[0],
+        },
+        "scenarios": {},
+    }
+    for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+        results["scenarios"][name] = await run_scenario(app, name, env, args)
+
+    print_report(results)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(counts_only(results) if args.counts_only else results, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        ignored = ("python",)
+        old_config = {k: v for k, v in baseline.get("config", {}).items() if k not in ignored}
+        new_config = {k: v for k, v in results["config"].items() if k not in ignored}
+        if old_config != new_config:
+            print("\nWarning: baseline was recorded with a different configuration")
+        if baseline.get("counts_only"):
+            print("\nBaseline has counts only; record one locally with --save-baseline to compare latency")
+        regressions = compare_to_baseline(results, baseline, args.tolerance, args.count_tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,80 @@
+"""
+Benchmark for the batch conversation endpoint.
+
+Processes one message for every seeded user, first with one POST to
+/conversation/{user_id} per user and then with a single call to
+/batch/conversations, and reports items per second and MongoDB operations per
+item. Use --model-latency to see throughput bounded by the model rather than
+per-request overhead.
+
+Usage:
+    python -m benchmarks.bench_batch
+    python -m benchmarks.bench_batch --users 500 --model-latency 0.05 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import List
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+
+from benchmarks.asgi_client import request  # noqa: E402
+from benchmarks.bench_api import _setup  # noqa: E402
+
+MESSAGE = "Summarise my spending for last month."
+
+
+async def per_request(app, user_ids: List[str], concurrency: int) -> float:
+    queue = list(user_ids)
+
+    async def worker():
+        while queue:
+            user_id = queue.pop()
+            await request(app, "POST", f"/api/v1/conversation/{user_id}", {"message": MESSAGE})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def batch(app, user_ids: List[str], concurrency: int) -> float:
+    items = [{"user_id": user_id, "message": MESSAGE} for user_id in user_ids]
+    start = time.perf_counter()
+    response = await request(app, "POST", "/api/v1/batch/conversations", {"items": items, "concurrency": concurrency})
+    elapsed = time.perf_counter() - start
+    last = json.loads(response.body.decode("utf-8").splitlines()[-1])
+    assert last["type"] == "done" and last["completed"] == len(items), last
+    return elapsed
+
+
+async def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the batch conversation endpoint.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--docs-per-user", type=int, default=20)
+    parser.add_argument("--history", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests / model calls")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="Simulated model latency in seconds")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--mongo-db", default="smartfin_bench")
+    args = parser.parse_args(argv)
+
+    from app.main import app
+    from app.services.ai_service import AIService
+
+    env = await _setup(args)
+    counter, user_ids = env["counter"], env["user_ids"]
+
+    print(f"users: {args.users}, concurrency: {args.concurrency}, model latency: {args.model_latency}s")
+    print(f"{'mode':<14}{'seconds':>10}{'items/s':>10}{'mongo/item':>12}")
+    for label, run in (("per-request", per_request), ("batch", batch)):
+        AIService.chats.clear()
+        counter.reset()
+        elapsed = await run(app, user_ids, args.concurrency)
+        print(f"{label:<14}{elapsed:>10.2f}{len(user_ids) / elapsed:>10.1f}{counter.total / len(user_ids):>12.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
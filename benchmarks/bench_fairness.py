@@ -0,0 +1,125 @@
+"""
+Benchmark for per-user rate limiting and fair scheduling.
+
+Normal users send a message every --think seconds while a few heavy users
+flood the conversation endpoint from many concurrent loops. The model has a
+fixed latency and MODEL_CONCURRENCY slots, so it is the contended resource.
+Reports normal users' latency percentiles, heavy users' completed and
+throttled requests, for:
+
+    fifo         model slots handed out first come, first served, no rate limit
+    fair         weighted fair scheduling of model slots, no rate limit
+    fair+limit   fair scheduling and the per-user token bucket
+
+Usage:
+    python -m benchmarks.bench_fairness
+    python -m benchmarks.bench_fairness --heavy-users 4 --heavy-concurrency 32 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+
+from benchmarks.asgi_client import request  # noqa: E402
+from benchmarks.bench_api import _setup, percentile  # noqa: E402
+
+
+class FifoScheduler:
+    """The same slot limit as FairScheduler, granted in arrival order."""
+
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+        self._semaphore = asyncio.Semaphore(scheduler.concurrency)
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        async with self._semaphore:
+            yield
+
+    async def call(self, func, *args, **kwargs):
+        return await self._scheduler.call(func, *args, **kwargs)
+
+    async def run(self, user_id: str, func, *args, **kwargs):
+        async with self.slot(user_id):
+            return await self.call(func, *args, **kwargs)
+
+
+async def run_mode(app, normal_users: List[str], heavy_users: List[str], args) -> Dict:
+    normal_latencies: List[float] = []
+    heavy = {"completed": 0, "throttled": 0}
+    deadline = time.perf_counter() + args.duration
+
+    async def normal(user_id: str, offset: float):
+        await asyncio.sleep(offset)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await request(app, "POST", f"/api/v1/conversation/{user_id}", {"message": "How are my savings?"})
+            if response.status == 200:
+                normal_latencies.append((time.perf_counter() - start) * 1000.0)
+            await asyncio.sleep(args.think)
+
+    async def flood(user_id: str):
+        while time.perf_counter() < deadline:
+            response = await request(app, "POST", f"/api/v1/conversation/{user_id}", {"message": "Again!"})
+            if response.status == 429:
+                heavy["throttled"] += 1
+                # Misbehaving clients retry quickly instead of honouring Retry-After
+                await asyncio.sleep(0.05)
+            else:
+                heavy["completed"] += 1
+
+    tasks = [normal(user_id, i * args.think / len(normal_users)) for i, user_id in enumerate(normal_users)]
+    tasks += [flood(user_id) for user_id in heavy_users for _ in range(args.heavy_concurrency)]
+    await asyncio.gather(*tasks)
+    return {"normal": normal_latencies, **heavy}
+
+
+async def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-user rate limiting and fair scheduling.")
+    parser.add_argument("--normal-users", type=int, default=30)
+    parser.add_argument("--heavy-users", type=int, default=2)
+    parser.add_argument("--heavy-concurrency", type=int, default=16, help="Concurrent request loops per heavy user")
+    parser.add_argument("--think", type=float, default=1.5, help="Seconds between a normal user's messages")
+    parser.add_argument("--duration", type=float, default=6.0)
+    parser.add_argument("--model-latency", type=float, default=0.05)
+    parser.add_argument("--model-concurrency", type=int, default=8)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--mongo-db", default="smartfin_bench")
+    args = parser.parse_args(argv)
+    args.users = args.normal_users + args.heavy_users
+    args.docs_per_user, args.history = 20, 4
+
+    from app.main import app
+    from app.core import throttling
+    from app.core.config import settings
+
+    env = await _setup(args)
+    user_ids = env["user_ids"]
+    normal_users, heavy_users = user_ids[:args.normal_users], user_ids[args.normal_users:]
+    fair = throttling.FairScheduler(args.model_concurrency)
+
+    print(f"normal users: {args.normal_users} (one message per {args.think}s), "
+          f"heavy users: {args.heavy_users} x {args.heavy_concurrency} loops, "
+          f"model: {args.model_concurrency} slots x {args.model_latency}s")
+    print(f"{'mode':<12}{'normal p50':>12}{'p95':>10}{'p99':>10}{'normal n':>10}{'heavy ok':>10}{'throttled':>11}")
+    for label, scheduler, limited in (
+        ("fifo", FifoScheduler(fair), False),
+        ("fair", fair, False),
+        ("fair+limit", fair, True),
+    ):
+        throttling.model_scheduler = scheduler
+        throttling.rate_limiter.store = throttling.MemoryBucketStore()
+        settings.RATE_LIMIT_ENABLED = limited
+        result = await run_mode(app, normal_users, heavy_users, args)
+        latencies = result["normal"]
+        print(f"{label:<12}{percentile(latencies, 50):>12.1f}{percentile(latencies, 95):>10.1f}"
+              f"{percentile(latencies, 99):>10.1f}{len(latencies):>10}{result['completed']:>10}{result['throttled']:>11}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
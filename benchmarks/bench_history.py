@@ -0,0 +1,120 @@
+"""
+Benchmark for conversation history archiving.
+
+Seeds users with long histories spread over --days days, then reports the size
+of the hot conversation_history collection and the latency and MongoDB
+operations of history reads and chat rehydration, before and after archiving
+messages older than --archive-after days into compressed buckets.
+
+Usage:
+    python -m benchmarks.bench_history
+    python -m benchmarks.bench_history --users 200 --messages 2000 --archive-after 30
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+
+import bson  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+from benchmarks.bench_api import _setup, percentile  # noqa: E402
+
+
+def build_history(user_ids: List[str], messages: int, days: float) -> List[Dict]:
+    now = datetime.now()
+    step = timedelta(days=days) / max(messages, 1)
+    docs = []
+    for user_id in user_ids:
+        for i in range(messages):
+            docs.append({
+                "_id": ObjectId(),
+                "user_id": user_id,
+                "userId": user_id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"Message {i} about budgeting, savings goals and last month's grocery spending.",
+                "timestamp": now - step * (messages - i),
+            })
+    return docs
+
+
+async def collection_size(db, name: str) -> tuple:
+    docs = await db[name].find({}).to_list(None)
+    return len(docs), sum(len(bson.encode(doc)) for doc in docs)
+
+
+async def measure_reads(ai_service, user_ids: List[str], counter) -> Dict[str, tuple]:
+    from app.services.ai_service import AIService
+
+    results = {}
+    for label in ("history", "rehydration"):
+        latencies = []
+        counter.reset()
+        for user_id in user_ids:
+            start = time.perf_counter()
+            if label == "history":
+                await ai_service.get_conversation_history(user_id)
+            else:
+                AIService.chats.pop(user_id, None)
+                await ai_service._get_or_create_chat(user_id)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        results[label] = (percentile(latencies, 50), percentile(latencies, 95), counter.total / len(user_ids))
+    return results
+
+
+async def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark conversation history archiving.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=1000, help="Messages per user")
+    parser.add_argument("--days", type=float, default=365.0, help="Days the messages are spread over")
+    parser.add_argument("--archive-after", type=float, default=30.0, help="Archive messages older than this many days")
+    parser.add_argument("--bucket-size", type=int, default=200)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--mongo-db", default="smartfin_bench")
+    args = parser.parse_args(argv)
+    args.docs_per_user, args.history, args.model_latency = 1, 0, 0.0
+
+    from app.core.config import settings
+    from app.services.ai_service import AIService
+    from app.services.history_service import HistoryService, HISTORY_COLLECTION, ARCHIVE_COLLECTION
+
+    env = await _setup(args)
+    counter, user_ids = env["counter"], env["user_ids"]
+    db = env["client"][args.mongo_db]
+    await db[ARCHIVE_COLLECTION].delete_many({})
+    await db[HISTORY_COLLECTION].insert_many(build_history(user_ids, args.messages, args.days))
+    ai_service = AIService()
+
+    settings.HISTORY_ARCHIVE_AFTER_DAYS = None
+    before = await measure_reads(ai_service, user_ids, counter)
+    hot_before = await collection_size(db, HISTORY_COLLECTION)
+
+    settings.HISTORY_ARCHIVE_AFTER_DAYS = args.archive_after
+    settings.HISTORY_ARCHIVE_BUCKET_SIZE = args.bucket_size
+    start = time.perf_counter()
+    archived = await HistoryService.archive_old_messages()
+    archive_seconds = time.perf_counter() - start
+    after = await measure_reads(ai_service, user_ids, counter)
+    hot_after = await collection_size(db, HISTORY_COLLECTION)
+    archive = await collection_size(db, ARCHIVE_COLLECTION)
+
+    print(f"users: {args.users}, messages per user: {args.messages}, archived: {archived} in {archive_seconds:.2f}s")
+    print(f"{'tier':<22}{'documents':>12}{'KiB':>12}")
+    print(f"{'hot (before)':<22}{hot_before[0]:>12}{hot_before[1] / 1024:>12.1f}")
+    print(f"{'hot (after)':<22}{hot_after[0]:>12}{hot_after[1] / 1024:>12.1f}")
+    print(f"{'archive (after)':<22}{archive[0]:>12}{archive[1] / 1024:>12.1f}")
+    print()
+    print(f"{'read':<22}{'p50 ms':>10}{'p95 ms':>10}{'mongo ops':>11}")
+    for label in ("history", "rehydration"):
+        for phase, results in (("before", before), ("after", after)):
+            p50, p95, ops = results[label]
+            print(f"{label + ' (' + phase + ')':<22}{p50:>10.2f}{p95:>10.2f}{ops:>11.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
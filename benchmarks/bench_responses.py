@@ -0,0 +1,100 @@
+"""
+Micro-benchmark for conversation response serialization.
+
+Serves the same conversation history through two minimal FastAPI endpoints:
+one returning a ConversationResponse model (validated against response_model
+and encoded by FastAPI's default JSON path), and one returning the
+FastJSONResponse used by the API. Reports server CPU time per response and
+bytes on the wire with no compression, gzip and brotli.
+
+Usage:
+    python -m benchmarks.bench_responses
+    python -m benchmarks.bench_responses --messages 100 --content-size 600 --repeat 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+
+from fastapi import FastAPI  # noqa: E402
+
+from app.core import compression  # noqa: E402
+from app.core.compression import CompressionMiddleware  # noqa: E402
+from app.core.responses import FastJSONResponse  # noqa: E402
+from app.schemas.conversation import ConversationResponse  # noqa: E402
+from benchmarks.asgi_client import request  # noqa: E402
+
+
+def build_history(messages: int, content_size: int) -> List[Dict]:
+    rng = random.Random(3)
+    words = ["budget", "expenses", "savings", "income", "rent", "groceries", "transport", "invoice", "profit"]
+    now = datetime.now()
+    history = []
+    for i in range(messages):
+        text = " ".join(rng.choice(words) for _ in range(content_size // 8))
+        history.append({
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": text[:content_size],
+            "timestamp": now - timedelta(minutes=messages - i),
+        })
+    return history
+
+
+def build_apps(history: List[Dict]):
+    validated = FastAPI()
+    fast = FastAPI()
+
+    @validated.post("/conversation", response_model=ConversationResponse)
+    async def validated_endpoint():
+        return ConversationResponse(messages=history, success=True)
+
+    @fast.post("/conversation", response_model=ConversationResponse)
+    async def fast_endpoint():
+        return FastJSONResponse({
+            "response": None, "messages": history, "conversation_id": None, "success": True, "error": None
+        })
+
+    return validated, fast
+
+
+async def measure(app, repeat: int, accept_encoding: str) -> Dict[str, float]:
+    headers = {"accept-encoding": accept_encoding} if accept_encoding else {}
+    response = await request(app, "POST", "/conversation", headers=headers)
+    start = time.process_time()
+    for _ in range(repeat):
+        await request(app, "POST", "/conversation", headers=headers)
+    cpu = (time.process_time() - start) / repeat
+    return {"cpu_ms": cpu * 1000.0, "bytes": len(response.body), "encoding": response.headers.get("content-encoding", "identity")}
+
+
+async def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark conversation response serialization.")
+    parser.add_argument("--messages", type=int, default=100, help="History messages per response")
+    parser.add_argument("--content-size", type=int, default=400, help="Characters per message")
+    parser.add_argument("--repeat", type=int, default=300, help="Responses per measurement")
+    args = parser.parse_args(argv)
+
+    history = build_history(args.messages, args.content_size)
+    validated, fast = build_apps(history)
+    candidates = [("validated model", validated, ""), ("fast path", fast, "")]
+    for label, app in (("validated model", validated), ("fast path", fast)):
+        wrapped = CompressionMiddleware(app)
+        candidates.append((f"{label} + gzip", wrapped, "gzip"))
+        if compression.brotli is not None:
+            candidates.append((f"{label} + brotli", wrapped, "br"))
+
+    print(f"messages: {args.messages}, content size: {args.content_size}, repeat: {args.repeat}")
+    print(f"{'variant':<28}{'cpu ms/resp':>13}{'wire bytes':>12}{'encoding':>10}")
+    for label, app, accept in candidates:
+        r = await measure(app, args.repeat, accept)
+        print(f"{label:<28}{r['cpu_ms']:>13.3f}{r['bytes']:>12}{r['encoding']:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
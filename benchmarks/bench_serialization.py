@@ -0,0 +1,121 @@
+"""
+Micro-benchmark for prompt context serialization.
+
+Compares the previous three-pass approach (len(str(v)) field filtering, in-place
+ObjectId/datetime conversion, then json.dumps) with the single-pass
+serialize_user_context, using orjson and the standard library encoder.
+
+Usage:
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --docs-per-user 500 --repeat 50
+"""
+import argparse
+import copy
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+
+from bson import ObjectId  # noqa: E402
+
+from app.core import serialization  # noqa: E402
+from benchmarks.fakes import generate_dataset  # noqa: E402
+
+
+def _legacy_convert(data: Any) -> Any:
+    if isinstance(data, dict):
+        for key, value in list(data.items()):
+            if isinstance(value, ObjectId):
+                data[key] = str(value)
+            elif isinstance(value, datetime):
+                data[key] = value.isoformat()
+            elif isinstance(value, (dict, list)):
+                data[key] = _legacy_convert(value)
+        return data
+    elif isinstance(data, list):
+        return [_legacy_convert(item) for item in data]
+    return data
+
+
+def legacy_serialize(user_data: Dict[str, Any]) -> str:
+    filtered = {}
+    for name, docs in user_data.items():
+        if isinstance(docs, list) and len(docs) > 1:
+            filtered[name] = [
+                {k: v for k, v in doc.items()
+                 if not isinstance(v, (dict, list)) or len(str(v)) < 1000}
+                for doc in docs
+            ]
+        else:
+            filtered[name] = docs
+    return json.dumps(_legacy_convert(filtered))
+
+
+def build_user_context(docs_per_user: int, large_field_items: int) -> Dict[str, Any]:
+    """Shape one user's data the way _get_all_user_data_from_mongodb returns it."""
+    _, collections = generate_dataset(users=1, docs_per_user=docs_per_user, history_per_user=0)
+    # Large nested fields (e.g. audit trails) that the field cap is meant to drop
+    for doc in collections["transactions"]:
+        doc["audit"] = [{"at": datetime.now(), "by": ObjectId(), "change": "updated"} for _ in range(large_field_items)]
+    context = {}
+    for name, docs in collections.items():
+        if name == "conversation_history" or not docs:
+            continue
+        context[name] = docs if len(docs) > 1 else docs[0]
+    return context
+
+
+def measure(fn: Callable[[Dict], str], make_input: Callable[[], Dict], repeat: int) -> Dict[str, float]:
+    # Inputs are prepared outside the timed region: the legacy path mutates them
+    inputs = [make_input() for _ in range(repeat)]
+    start = time.process_time()
+    for data in inputs:
+        output = fn(data)
+    cpu = (time.process_time() - start) / repeat
+
+    data = make_input()
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cpu_ms": cpu * 1000.0, "peak_kib": peak / 1024.0, "output_bytes": len(output.encode("utf-8"))}
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark prompt context serialization.")
+    parser.add_argument("--docs-per-user", type=int, default=200, help="Documents per collection for the user")
+    parser.add_argument("--large-field-items", type=int, default=100, help="Entries in a large nested field per transaction")
+    parser.add_argument("--repeat", type=int, default=20, help="Iterations per implementation")
+    args = parser.parse_args(argv)
+
+    base = build_user_context(args.docs_per_user, args.large_field_items)
+    make_input = lambda: copy.deepcopy(base)  # noqa: E731
+
+    candidates = [("legacy (filter + convert + json.dumps)", legacy_serialize)]
+    fast_json = serialization.orjson
+    if fast_json is not None:
+        candidates.append(("single-pass (orjson)", serialization.serialize_user_context))
+
+    def stdlib_serialize(data):
+        serialization.orjson = None
+        try:
+            return serialization.serialize_user_context(data)
+        finally:
+            serialization.orjson = fast_json
+
+    candidates.append(("single-pass (json)", stdlib_serialize))
+
+    print(f"docs per collection: {args.docs_per_user}, large field items: {args.large_field_items}, repeat: {args.repeat}")
+    print(f"{'implementation':<42}{'cpu ms/call':>13}{'peak KiB':>12}{'output bytes':>14}")
+    for label, fn in candidates:
+        r = measure(fn, make_input, args.repeat)
+        print(f"{label:<42}{r['cpu_ms']:>13.3f}{r['peak_kib']:>12.1f}{r['output_bytes']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark for worker cold start.
+
+Starts fresh interpreters, each of which imports the app, runs its startup
+hook and sends two conversation requests for different users, with and
+without the startup warm-up. Reports import time, startup time and the
+latency of the first and second request. The Gemini SDK objects are really
+constructed; the stub model then stands in for the API, paying
+--connect-latency once on its first call to simulate opening the connection.
+Children run from a temporary directory to check that the prompt and
+settings do not depend on the working directory.
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 5 --connect-latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIELDS = ["import_ms", "startup_ms", "first_request_ms", "second_request_ms"]
+
+
+async def child(args) -> Dict:
+    start = time.perf_counter()
+    import google.generativeai as genai
+    from app.main import app
+    import_ms = (time.perf_counter() - start) * 1000.0
+
+    from app.services.ai_service import AIService, _load_prompt
+    from benchmarks.asgi_client import Lifespan, request
+    from benchmarks.bench_api import _setup
+    from benchmarks.fakes import StubModel
+
+    env = await _setup(args)
+    stub = StubModel(latency=args.model_latency, connect_latency=args.connect_latency)
+    real_model = genai.GenerativeModel
+
+    def generative_model(*model_args, **model_kwargs):
+        # Pay the real SDK construction cost, then answer with the stub
+        real_model(*model_args, **model_kwargs)
+        return stub
+
+    genai.GenerativeModel = generative_model
+    AIService.model = None
+
+    lifespan = Lifespan(app)
+    start = time.perf_counter()
+    await lifespan.startup()
+    startup_ms = (time.perf_counter() - start) * 1000.0
+
+    latencies = []
+    for user_id in env["user_ids"][:2]:
+        start = time.perf_counter()
+        response = await request(app, "POST", f"/api/v1/conversation/{user_id}", {"message": "How are my savings?"})
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        assert response.status == 200, response.body
+
+    await lifespan.shutdown()
+    return {
+        "import_ms": import_ms,
+        "startup_ms": startup_ms,
+        "first_request_ms": latencies[0],
+        "second_request_ms": latencies[1],
+        "prompt_loaded": not _load_prompt('system_instruction.txt').startswith("Unable to load prompt"),
+    }
+
+
+def run_child(warmup: bool, args) -> Dict:
+    env = dict(os.environ, WARMUP_ENABLED="true" if warmup else "false", PYTHONPATH=ROOT, PYTHONWARNINGS="ignore")
+    command = [
+        sys.executable, "-m", "benchmarks.bench_startup", "--child",
+        "--connect-latency", str(args.connect_latency), "--model-latency", str(args.model_latency),
+    ]
+    with tempfile.TemporaryDirectory() as cwd:
+        output = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark worker cold start.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per mode")
+    parser.add_argument("--connect-latency", type=float, default=0.15,
+                        help="Simulated seconds to open the model API connection")
+    parser.add_argument("--model-latency", type=float, default=0.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        args.users, args.docs_per_user, args.history = 10, 20, 10
+        args.mongo_uri, args.mongo_db = None, "smartfin_bench"
+        print(json.dumps(asyncio.run(child(args))))
+        return
+
+    print(f"runs: {args.runs}, simulated connect latency: {args.connect_latency}s (medians)")
+    print(f"{'mode':<12}" + "".join(f"{field:>20}" for field in FIELDS) + f"{'prompt loaded':>15}")
+    for label, warmup in (("cold", False), ("warm-up", True)):
+        results = [run_child(warmup, args) for _ in range(args.runs)]
+        medians = [statistics.median(r[field] for r in results) for field in FIELDS]
+        loaded = all(r["prompt_loaded"] for r in results)
+        print(f"{label:<12}" + "".join(f"{value:>20.1f}" for value in medians) + f"{str(loaded):>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark for the WebSocket conversation channel.
+
+Opens many idle connections to measure the memory each one costs, then runs
+chat turns over warm WebSocket sessions and over HTTP POST for comparison,
+against the same in-memory Mongo stand-in and stub model as bench_api.
+
+Usage:
+    python -m benchmarks.bench_websocket
+    python -m benchmarks.bench_websocket --idle-connections 5000 --turns 200
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+os.environ.setdefault("WS_MAX_CONNECTIONS_PER_USER", "1000000")
+# Every turn reuses a handful of users; measure the transport, not the rate limiter
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from benchmarks.asgi_client import WebSocketClient, request  # noqa: E402
+from benchmarks.bench_api import _setup, percentile  # noqa: E402
+
+
+async def idle_connections(app, user_ids: List[str], count: int) -> float:
+    """Return the traced memory per idle connection, in KiB."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    clients = []
+    for i in range(count):
+        client = WebSocketClient(app, f"/api/v1/conversation/{user_ids[i % len(user_ids)]}/ws")
+        if not await client.connect():
+            break
+        await client.receive_json()  # ready
+        clients.append(client)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for client in clients:
+        await client.close()
+    return (after - before) / 1024.0 / max(len(clients), 1)
+
+
+async def websocket_turns(app, user_ids: List[str], turns: int, concurrency: int):
+    first_token, full_turn = [], []
+
+    async def run(user_id: str, count: int):
+        client = WebSocketClient(app, f"/api/v1/conversation/{user_id}/ws")
+        await client.connect()
+        await client.receive_json()
+        for i in range(count):
+            start = time.perf_counter()
+            await client.send_json({"operation": "message", "message": f"How are my expenses? ({i})"})
+            first = None
+            while True:
+                event = await client.receive_json()
+                if event["type"] == "token" and first is None:
+                    first = time.perf_counter()
+                if event["type"] == "history_delta":
+                    break
+            end = time.perf_counter()
+            first_token.append(((first or end) - start) * 1000.0)
+            full_turn.append((end - start) * 1000.0)
+        await client.close()
+
+    per_client = max(1, turns // concurrency)
+    await asyncio.gather(*(run(user_ids[i % len(user_ids)], per_client) for i in range(concurrency)))
+    return first_token, full_turn
+
+
+async def http_turns(app, user_ids: List[str], turns: int, concurrency: int):
+    latencies = []
+
+    async def run(user_id: str, count: int):
+        for i in range(count):
+            start = time.perf_counter()
+            await request(app, "POST", f"/api/v1/conversation/{user_id}", {"message": f"How are my expenses? ({i})"})
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+    per_client = max(1, turns // concurrency)
+    await asyncio.gather(*(run(user_ids[i % len(user_ids)], per_client) for i in range(concurrency)))
+    return latencies
+
+
+async def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the WebSocket conversation channel.")
+    parser.add_argument("--idle-connections", type=int, default=2000, help="Idle connections to open")
+    parser.add_argument("--turns", type=int, default=200, help="Chat turns per transport")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent conversations")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--docs-per-user", type=int, default=20)
+    parser.add_argument("--history", type=int, default=20)
+    parser.add_argument("--model-latency", type=float, default=0.0)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--mongo-db", default="smartfin_bench")
+    args = parser.parse_args(argv)
+
+    from app.main import app
+
+    env = await _setup(args)
+    user_ids = env["user_ids"]
+    counter = env["counter"]
+
+    per_connection = await idle_connections(app, user_ids, args.idle_connections)
+    print(f"idle connections: {args.idle_connections}, memory per connection: {per_connection:.1f} KiB")
+
+    print(f"{'transport':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'first token p50':>17}{'mongo/turn':>12}")
+    counter.reset()
+    first_token, ws = await websocket_turns(app, user_ids, args.turns, args.concurrency)
+    ws_ops = counter.total / max(len(ws), 1)
+    counter.reset()
+    http = await http_turns(app, user_ids, args.turns, args.concurrency)
+    http_ops = counter.total / max(len(http), 1)
+
+    print(f"{'websocket':<12}{percentile(ws, 50):>10.2f}{percentile(ws, 95):>10.2f}{percentile(ws, 99):>10.2f}"
+          f"{percentile(first_token, 50):>17.2f}{ws_ops:>12.2f}")
+    print(f"{'http':<12}{percentile(http, 50):>10.2f}{percentile(http, 95):>10.2f}{percentile(http, 99):>10.2f}"
+          f"{'-':>17}{http_ops:>12.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
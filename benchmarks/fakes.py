@@ -0,0 +1,388 @@
+"""
+In-process stand-ins for MongoDB and the Gemini model used by the benchmarks.
+
+The fake database implements only the subset of the Motor API that the
+application touches. Every call that would be a round-trip to a real server
+is recorded on an OpCounter so the benchmark can report Mongo operations per
+request.
+"""
+import copy
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+
+
+class OpCounter:
+    """Counts simulated Mongo round-trips, broken down by operation name."""
+
+    def __init__(self, on_record: Optional[Callable[[str], None]] = None):
+        self.ops = Counter()
+        self.on_record = on_record
+
+    def record(self, name: str) -> None:
+        self.ops[name] += 1
+        if self.on_record is not None:
+            self.on_record(name)
+
+    @property
+    def total(self) -> int:
+        return sum(self.ops.values())
+
+    def reset(self) -> None:
+        self.ops.clear()
+
+
+def _get_path(doc: Dict, path: str) -> Any:
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+class _Missing:
+    pass
+
+
+_MISSING = _Missing()
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$in":
+        return value is not _MISSING and value in operand
+    if op == "$ne":
+        return value is _MISSING or value != operand
+    if value is _MISSING or value is None:
+        return False
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    raise NotImplementedError(f"Unsupported query operator in fake Mongo: {op}")
+
+
+def matches(doc: Dict, query: Dict) -> bool:
+    """Evaluate a (small subset of a) MongoDB query against a document."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        value = _get_path(doc, key)
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif value is _MISSING or value != condition:
+            return False
+    return True
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        projected = {k: doc[k] for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    for key, value in projection.items():
+        if not value:
+            doc.pop(key, None)
+    return doc
+
+
+class FakeCursor:
+    def __init__(self, collection: "FakeCollection", query: Dict, projection: Optional[Dict]):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = None
+        self._limit = 0
+
+    def sort(self, key: str, direction: int = 1) -> "FakeCursor":
+        self._sort = (key, direction)
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        self._limit = count
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in await self.to_list():
+            yield doc
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        self._collection.counter.record("find")
+        docs = [d for d in self._collection.docs if matches(d, self._query)]
+        if self._sort:
+            key, direction = self._sort
+            docs.sort(key=lambda d: d.get(key, datetime.min), reverse=direction < 0)
+        for cap in (self._limit, length):
+            if cap:
+                docs = docs[:cap]
+        return [_project(d, self._projection) for d in docs]
+
+
+class FakeCollection:
+    def __init__(self, name: str, counter: OpCounter):
+        self.name = name
+        self.counter = counter
+        self.docs: List[Dict] = []
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> FakeCursor:
+        return FakeCursor(self, query, projection)
+
+    async def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        self.counter.record("find_one")
+        for doc in self.docs:
+            if matches(doc, query or {}):
+                return _project(doc, projection)
+        return None
+
+    async def insert_one(self, doc: Dict):
+        self.counter.record("insert_one")
+        doc = dict(doc)
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+
+    async def insert_many(self, docs: List[Dict]):
+        self.counter.record("insert_many")
+        for doc in docs:
+            doc = dict(doc)
+            doc.setdefault("_id", ObjectId())
+            self.docs.append(doc)
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        self.counter.record("update_one")
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        if doc is None:
+            if not upsert:
+                return
+            doc = {k: v for k, v in query.items() if not k.startswith("$")}
+            doc.update(update.get("$setOnInsert", {}))
+            self.docs.append(doc)
+        doc.update(update.get("$set", {}))
+        for key, value in update.get("$addToSet", {}).items():
+            values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+            existing = doc.setdefault(key, [])
+            existing.extend(v for v in values if v not in existing)
+        for key, value in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + value
+
+    async def delete_many(self, query: Dict):
+        self.counter.record("delete_many")
+        self.docs = [d for d in self.docs if not matches(d, query)]
+
+    async def count_documents(self, query: Dict) -> int:
+        self.counter.record("count_documents")
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def create_index(self, keys, **kwargs) -> str:
+        self.counter.record("create_index")
+        return kwargs.get("name") or "_".join(f"{k}_{d}" for k, d in ([(keys, 1)] if isinstance(keys, str) else keys))
+
+
+class FakeDatabase:
+    def __init__(self, counter: OpCounter):
+        self.counter = counter
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name, self.counter)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        self.counter.record("list_collection_names")
+        return [name for name, coll in self._collections.items() if coll.docs]
+
+    async def command(self, name: str, *args, **kwargs) -> Dict:
+        self.counter.record(f"command:{name}")
+        return {"ok": 1.0}
+
+
+class FakeMongoClient:
+    def __init__(self, db_name: str, counter: OpCounter):
+        self.counter = counter
+        self.db = FakeDatabase(counter)
+        self.admin = FakeDatabase(counter)
+        self._db_name = db_name
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        return self.db
+
+    def close(self) -> None:
+        pass
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubPart:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubContent:
+    def __init__(self, role: str, text: str):
+        self.role = role
+        self.parts = [_StubPart(text)]
+
+
+class StubChat:
+    """Mimics genai.ChatSession: records history and returns a canned reply."""
+
+    def __init__(self, model: "StubModel", history: Optional[List] = None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream: bool = False):
+        text = content if isinstance(content, str) else str(content)
+        self.model.connect()
+        self.model.record_prompt(text)
+        if self.model.latency:
+            # The real SDK call is synchronous and blocks the event loop the same way
+            time.sleep(self.model.latency)
+        reply = self.model.reply
+        self.history.append(_StubContent("user", text))
+        self.history.append(_StubContent("model", reply))
+        if stream:
+            words = reply.split(" ")
+            return iter([_StubResponse(w + (" " if i < len(words) - 1 else "")) for i, w in enumerate(words)])
+        return _StubResponse(reply)
+
+
+class StubModel:
+    """Mimics genai.GenerativeModel without any network access."""
+
+    def __init__(self, reply: str = "Here is a short summary of your finances.", latency: float = 0.0,
+                 connect_latency: float = 0.0):
+        self.reply = reply
+        self.latency = latency
+        # Paid once by the first API call, like the SDK opening its connection
+        self.connect_latency = connect_latency
+        self.connected = False
+        self.calls = 0
+        self.prompt_bytes = 0
+
+    def connect(self) -> None:
+        if not self.connected:
+            self.connected = True
+            if self.connect_latency:
+                time.sleep(self.connect_latency)
+
+    def count_tokens(self, contents) -> int:
+        self.connect()
+        return len(str(contents).split())
+
+    def record_prompt(self, text: str) -> None:
+        self.calls += 1
+        self.prompt_bytes += len(text.encode("utf-8"))
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.prompt_bytes = 0
+
+    def generate_content(self, contents) -> "_StubResponse":
+        text = contents if isinstance(contents, str) else str(contents)
+        self.connect()
+        self.record_prompt(text)
+        if self.latency:
+            time.sleep(self.latency)
+        return _StubResponse(self.reply)
+
+    def start_chat(self, history: Optional[List] = None) -> StubChat:
+        return StubChat(self, history)
+
+
+def generate_dataset(users: int, docs_per_user: int, history_per_user: int, seed: int = 7):
+    """
+    Build synthetic financial data for the benchmarks.
+    Returns the seeded userId values and a mapping of collection name to documents.
+    """
+    rng = random.Random(seed)
+    categories = ["Food", "Rent", "Transport", "Entertainment", "Utilities", "Health"]
+    now = datetime.now()
+    user_ids = [f"bench-user-{i:05d}" for i in range(users)]
+    collections: Dict[str, List[Dict]] = {
+        "users": [], "transactions": [], "expense": [], "products": [], "conversation_history": []
+    }
+
+    for user_id in user_ids:
+        collections["users"].append({
+            "_id": ObjectId(),
+            "userId": user_id,
+            "name": f"User {user_id}",
+            "email": f"{user_id}@example.com",
+            "password": "not-a-real-hash",
+            "createdAt": now - timedelta(days=rng.randint(1, 900)),
+        })
+        for i in range(docs_per_user):
+            collections["transactions"].append({
+                "_id": ObjectId(),
+                "userId": user_id,
+                "amount": round(rng.uniform(1, 500), 2),
+                "category": rng.choice(categories),
+                "description": "Synthetic transaction " + "x" * rng.randint(10, 80),
+                "date": now - timedelta(days=rng.randint(0, 365)),
+                "tags": [rng.choice(categories) for _ in range(rng.randint(0, 5))],
+                "meta": {"source": "bench", "seq": i, "notes": ["n"] * rng.randint(0, 40)},
+            })
+            collections["expense"].append({
+                "_id": ObjectId(),
+                "userId": user_id,
+                "amount": round(rng.uniform(1, 200), 2),
+                "category": rng.choice(categories),
+                "createdAt": now - timedelta(days=rng.randint(0, 365)),
+            })
+        collections["products"].append({
+            "_id": ObjectId(),
+            "userId": user_id,
+            "items": [{"name": f"Product {j}", "price": j * 1.5} for j in range(docs_per_user)],
+        })
+        for i in range(history_per_user):
+            collections["conversation_history"].append({
+                "_id": ObjectId(),
+                "user_id": user_id,
+                "userId": user_id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"Seeded message {i} " + "y" * rng.randint(20, 200),
+                "timestamp": now - timedelta(minutes=history_per_user - i),
+            })
+    return user_ids, collections
+
+
+async def load_dataset(db, collections: Dict[str, List[Dict]], drop: bool = False) -> None:
+    """Insert a generated dataset into a fake or real (Motor) database."""
+    for name, docs in collections.items():
+        if drop:
+            await db[name].delete_many({})
+        if docs:
+            await db[name].insert_many(docs)